@@ -0,0 +1,90 @@
+"""
+Este arquivo implementa o controle de admissão com filas de prioridade.
+A ideia é que cada classe de rota tenha sua própria faixa (lane), com limite
+de requisições em andamento e pool de threads dedicado: o chatbot, que depende
+da OpenAI, nunca ocupa a capacidade da verificação de telefone nem o event loop
+que atende o health check. Acima do limite, a requisição é recusada na hora.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+
+class AdmissionRejected(Exception):
+    """Lane cheia: a rota deve responder 503 com Retry-After."""
+
+    def __init__(self, lane: str, retry_after: int) -> None:
+        super().__init__(f"Capacidade esgotada na fila '{lane}'.")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane:
+    """Faixa de admissão com limite de requisições em andamento e pool próprio."""
+
+    def __init__(self, name: str, max_inflight: int, retry_after: int) -> None:
+        self.name = name
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix=f"lane-{name}")
+        # Só é alterado no event loop, então não precisa de lock.
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Executa `fn` no pool da lane ou recusa se o limite já foi atingido."""
+        if self.inflight >= self.max_inflight:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self.retry_after)
+
+        loop = asyncio.get_running_loop()
+        # Copia o contexto para a thread, como asyncio.to_thread faz.
+        context = contextvars.copy_context()
+        future = self.executor.submit(partial(context.run, fn, *args, **kwargs))
+        self.inflight += 1
+        self.admitted += 1
+        # A vaga só é devolvida quando a thread termina: se o cliente desconectar,
+        # o await é cancelado mas o trabalho continua ocupando o pool.
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        self.inflight -= 1
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # Event loop já encerrado (shutdown): não há mais quem contar.
+            pass
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionController:
+    """Conjunto de lanes nomeadas (ex: `chatbot`, `phone`)."""
+
+    def __init__(self, limits: dict[str, int], retry_after: int) -> None:
+        self.lanes = {name: Lane(name, limit, retry_after) for name, limit in limits.items()}
+
+    def lane(self, name: str) -> Lane:
+        return self.lanes[name]
+
+    def stats(self) -> dict[str, Any]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self) -> None:
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=False, cancel_futures=True)
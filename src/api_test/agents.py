@@ -8,12 +8,27 @@ Fluxo principal:
 
 from __future__ import annotations
 
+import hashlib
 import json
-from typing import Any
-
-from openai import OpenAI
-
-from api_test.api_proraf import ProrafAPI
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+from api_test.api_proraf import DEFAULT_TALHAO, ProrafAPI
+from api_test.cache import CacheBackend, NullCache
+from api_test.gate import GATE_REPLIES, MessageGate, normalize
+from api_test.health import Upstream
+from api_test.memory import ConversationMemory
+from api_test.mirror import CatalogMirror
+from api_test.outbox import OUTBOX_METHODS, Outbox
+from api_test.phone import normalize_phone
+from api_test.planning import NARROW_PROMPTS, PlannerRouting, accepts, classify_intent, local_plan
+from api_test.prefetch import PrefetchStats, SpeculativePrefetch
+from api_test.shaping import shape_api_result
+from api_test.tracing import current_span, span
+from api_test.usage import UsageTracker, extract_usage
+from api_test.warmup import ActivityTracker
 from api_test.prompts import (
     CRUD_PLANNER_PROMPT,
     CRUD_RESULT_MESSAGE_PROMPT,
@@ -22,56 +37,184 @@ from api_test.prompts import (
 )
 from api_test.settings import settings
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+# Operações somente leitura: a mesma resposta da API sempre gera o mesmo texto.
+READ_ONLY_METHODS = frozenset({"listar_produtos", "verificar_telefone", "listar_telefones"})
+
+# Muda a chave das respostas em cache sempre que os prompts de resposta mudarem.
+_REPLY_PROMPTS_DIGEST = hashlib.sha256(
+    f"{CRUD_RESULT_MESSAGE_PROMPT}\n{WHATSAPP_MESSAGE_PROMPT}\n{settings.proraf_frontend_url}".encode("utf-8")
+).hexdigest()[:16]
+
+
+class _UpstreamFailure(Exception):
+    """Erro do ProRAF no meio de uma etapa composta; `result` é o erro original, com `status_code`."""
+
+    def __init__(self, result: dict[str, Any]) -> None:
+        super().__init__(result.get("error"))
+        self.result = result
+
+
+def _failed(response: Any) -> bool:
+    return not isinstance(response, dict) or "error" in response
+
+
+def _as_error(response: Any) -> dict[str, Any]:
+    if isinstance(response, dict):
+        return response
+    return {"success": False, "error": f"Resposta inesperada do ProRAF: {response!r}"}
+
 
 class AgriculturalMultiAgentService:
-    def __init__(self) -> None:
-        self.client = OpenAI(api_key=settings.openai_api_key) if settings.openai_api_key else None
+    def __init__(
+        self,
+        proraf: ProrafAPI | None = None,
+        cache: CacheBackend | None = None,
+        outbox: Outbox | None = None,
+        mirror: CatalogMirror | None = None,
+        openai_upstream: Upstream | None = None,
+    ) -> None:
+        self.client: OpenAI | None = None
+        if settings.openai_api_key:
+            # Import tardio: o SDK da OpenAI é pesado e só é necessário quando há chave.
+            from openai import OpenAI
+
+            self.client = OpenAI(api_key=settings.openai_api_key)
         self.model = settings.openai_model
-        self.proraf = ProrafAPI(
+        self.proraf = proraf or ProrafAPI(
             base_url=settings.proraf_api_base_url,
             secret_key=settings.proraf_secret_key,
             api_key=settings.proraf_api_key,
         )
+        self.cache = cache or NullCache()
+        self.outbox = outbox
+        self.mirror = mirror
+        self.openai_upstream = openai_upstream
+        self.usage = UsageTracker()
+        self.prefetch_stats = PrefetchStats()
+        # Com o aquecimento ligado, a atividade fica em SQLite, compartilhada pelos workers.
+        self.activity = ActivityTracker(
+            path=settings.activity_sqlite_path if settings.catalog_warmup_enabled else None
+        )
+        self.gate = MessageGate(enabled=settings.gate_enabled)
+        self.reply_cache_stats = {"hits": 0, "misses": 0}
+        self._reply_cache_lock = threading.Lock()
+        self.planner_routing = PlannerRouting()
+        self.memory = ConversationMemory(
+            max_turns=settings.memory_max_turns,
+            max_tokens=settings.memory_max_tokens,
+            idle_ttl_seconds=settings.memory_idle_ttl_seconds,
+            max_phones=settings.memory_max_phones,
+        )
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=settings.prefetch_max_workers or 2 * settings.admission_chatbot_max_inflight,
+            thread_name_prefix="prefetch",
+        )
 
-    def _invoke_json(self, system_prompt: str, user_message: str) -> dict[str, Any] | int:
-        if self.client is None:
-            return 0
-
-        user_payload = USER_MESSAGE_TEMPLATE.format(user_message=user_message)
+    def warm_up(self) -> dict[str, bool]:
+        """Abre conexões (DNS, TLS, pool) com OpenAI e ProRAF antes do primeiro request."""
+        openai_ok = False
+        if self.client is not None:
+            try:
+                openai_ok = self.ping_openai(timeout=settings.warmup_timeout_seconds)
+            except Exception as exc:
+                print(f"[WARMUP] Falha ao aquecer conexão com OpenAI: {exc}")
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                temperature=0,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_payload},
-                ],
-            )
-        except Exception:
-            return 0
+        return {
+            "openai": openai_ok,
+            "proraf": self.proraf.warm_up(timeout=settings.warmup_timeout_seconds),
+        }
 
-        content = (response.choices[0].message.content or "").strip()
-        return self._parse_agent_output(content)
+    def _record_openai(self, started_at: float, ok: bool) -> None:
+        if self.openai_upstream is not None:
+            self.openai_upstream.record((time.perf_counter() - started_at) * 1000, ok=ok)
 
-    def _invoke_text(self, system_prompt: str, user_message: str) -> str:
+    def ping_openai(self, timeout: float) -> bool:
+        """Consulta o modelo configurado na OpenAI (chamada leve, sem tokens); exceções sobem."""
         if self.client is None:
-            return ""
-
+            return False
+        if self.openai_upstream is not None and not self.openai_upstream.allow():
+            raise RuntimeError("Circuito aberto para a OpenAI.")
+        started_at = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                temperature=0.2,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message},
-                ],
-            )
+            self.client.models.retrieve(self.model, timeout=timeout)
         except Exception:
-            return ""
+            self._record_openai(started_at, ok=False)
+            raise
+        self._record_openai(started_at, ok=True)
+        return True
 
+    def _complete(
+        self,
+        system_prompt: str,
+        user_content: str,
+        temperature: float,
+        stage: str,
+        telefone: str | None,
+    ) -> str | None:
+        """
+        Chama o modelo e registra o `usage` da chamada.
+
+        O prompt de sistema (estático) vai sempre primeiro e sozinho, e todo dado
+        dinâmico fica na mensagem do usuário: assim o prefixo é idêntico entre
+        chamadas da mesma etapa e pode ser servido pelo prompt caching da OpenAI.
+        """
+        if self.client is None:
+            return None
+
+        with span(f"llm.{stage}", model=self.model, stage=stage) as current:
+            if self.openai_upstream is not None and not self.openai_upstream.allow():
+                # Circuito aberto: mesmo tratamento de uma falha da OpenAI, sem esperar o timeout.
+                current.fail("circuito aberto")
+                return None
+            started_at = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    temperature=temperature,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content},
+                    ],
+                    # Agrupa chamadas com o mesmo prefixo no mesmo cache do lado da OpenAI.
+                    prompt_cache_key=f"api_test:{stage}",
+                )
+            except Exception as exc:
+                self._record_openai(started_at, ok=False)
+                current.fail(f"{type(exc).__name__}: {exc}")
+                return None
+            self._record_openai(started_at, ok=True)
+
+            usage = extract_usage(response)
+            current.set(**usage)
+        self.usage.record(stage, self.model, usage, telefone)
         return (response.choices[0].message.content or "").strip()
 
+    def _invoke_json(
+        self,
+        system_prompt: str,
+        user_message: str,
+        stage: str = "planner",
+        telefone: str | None = None,
+    ) -> dict[str, Any] | int:
+        user_payload = USER_MESSAGE_TEMPLATE.format(user_message=user_message)
+        content = self._complete(system_prompt, user_payload, 0, stage, telefone)
+        if content is None:
+            return 0
+        return self._parse_agent_output(content)
+
+    def _invoke_text(
+        self,
+        system_prompt: str,
+        user_message: str,
+        stage: str = "text",
+        telefone: str | None = None,
+    ) -> str:
+        return self._complete(system_prompt, user_message, 0.2, stage, telefone) or ""
+
     @staticmethod
     def _parse_agent_output(content: str) -> dict[str, Any] | int:
         if content == "0":
@@ -86,37 +229,52 @@ class AgriculturalMultiAgentService:
         except json.JSONDecodeError:
             return 0
 
-    def _execute_crud(self, api_method: str, request_body: dict[str, Any]) -> dict[str, Any]:
+    def _execute_crud(
+        self,
+        api_method: str,
+        request_body: dict[str, Any],
+        prefetch: SpeculativePrefetch | None = None,
+        use_outbox: bool = True,
+    ) -> dict[str, Any]:
+        # Leituras passam pela pré-busca quando houver; ela cai no ProRAF se não servir.
+        reader = prefetch or self.proraf
+        # No modo outbox, escritas validadas vão para a fila local e são confirmadas na hora.
+        queue = use_outbox and self.outbox is not None and api_method in OUTBOX_METHODS
         try:
             if api_method == "verificar_telefone":
                 telefone = str(request_body.get("telefone", "")).strip()
                 if not telefone:
                     return {"success": False, "error": "Telefone é obrigatório para verificar telefone."}
-                return self.proraf.verificar_telefone(telefone)
+                return reader.verificar_telefone(telefone)
 
             if api_method == "criar_produto":
                 telefone = str(request_body.get("telefone", "")).strip()
                 name = str(request_body.get("name", "")).strip()
                 if not telefone or not name:
                     return {"success": False, "error": "Telefone e name são obrigatórios para criar produto."}
-                return self.proraf.criar_produto(
+                if queue:
+                    return self._enqueue(telefone, api_method, request_body)
+                created = self.proraf.criar_produto(
                     telefone=telefone,
                     nome=name,
                     descricao=request_body.get("description"),
                     variedade=request_body.get("variedade_cultivar"),
                 )
+                self._mirror_created(telefone, created, name)
+                return created
 
             if api_method == "listar_produtos":
                 telefone = str(request_body.get("telefone", "")).strip()
                 if not telefone:
                     return {"success": False, "error": "Telefone é obrigatório para listar produtos."}
-                return self.proraf.listar_produtos(telefone)
+                return reader.listar_produtos(telefone)
 
             if api_method == "atualizar_produto":
                 telefone = str(request_body.get("telefone", "")).strip()
                 product_id = request_body.get("product_id")
                 if not telefone or product_id is None:
                     return {"success": False, "error": "Telefone e product_id são obrigatórios para atualizar produto."}
+                # Sem write-through no espelho: só descrição e nome comercial mudam, e ele guarda id e nome.
                 return self.proraf.atualizar_produto(
                     telefone=telefone,
                     product_id=int(product_id),
@@ -127,18 +285,27 @@ class AgriculturalMultiAgentService:
             if api_method == "criar_lote":
                 telefone = str(request_body.get("telefone", "")).strip()
                 product_id = request_body.get("product_id")
-                talhao = str(request_body.get("talhao") or "Talhão A").strip()
+                talhao = str(request_body.get("talhao") or DEFAULT_TALHAO).strip()
                 producao = request_body.get("producao")
                 unidade = str(request_body.get("unidadeMedida", "")).strip()
 
-                if product_id is None:
-                    product_id = self._resolve_product_id_by_name(telefone, request_body)
-
-                if not telefone or product_id is None or producao is None or not unidade:
+                if queue:
+                    # O produto é resolvido pelo flusher, na hora do envio ao ProRAF.
+                    has_product = product_id is not None or bool(
+                        str(request_body.get("name") or request_body.get("product_name") or "").strip()
+                    )
+                else:
+                    if product_id is None:
+                        product_id = self._resolve_product_id_by_name(telefone, request_body, prefetch)
+                    has_product = product_id is not None
+
+                if not telefone or not has_product or producao is None or not unidade:
                     return {
                         "success": False,
                         "error": "Telefone, produto (product_id ou name), producao e unidadeMedida são obrigatórios para criar lote.",
                     }
+                if queue:
+                    return self._enqueue(telefone, api_method, request_body)
                 return self.proraf.criar_lote(
                     telefone=telefone,
                     product_id=int(product_id),
@@ -153,10 +320,26 @@ class AgriculturalMultiAgentService:
                 return {"success": True, "phones": self.proraf.listar_telefones()}
 
             return {"success": False, "error": f"api_method inválido: {api_method}"}
+        except _UpstreamFailure as exc:
+            # Devolve o erro do ProRAF como veio: a outbox decide pelo status se tenta de novo.
+            return exc.result
         except Exception as exc:
             return {"success": False, "error": f"Erro ao executar operação: {exc}"}
 
-    def _resolve_product_id_by_name(self, telefone: str, request_body: dict[str, Any]) -> int | None:
+    def _enqueue(self, telefone: str, api_method: str, request_body: dict[str, Any]) -> dict[str, Any]:
+        outbox_id = self.outbox.enqueue(telefone, api_method, request_body)
+        return {"success": True, "queued": True, "outbox_id": outbox_id, "status": "pending"}
+
+    def send_queued(self, api_method: str, request_body: dict[str, Any]) -> dict[str, Any]:
+        """Executa uma escrita da outbox diretamente no ProRAF (usado pelo flusher)."""
+        return self._execute_crud(api_method, request_body, use_outbox=False)
+
+    def _resolve_product_id_by_name(
+        self,
+        telefone: str,
+        request_body: dict[str, Any],
+        prefetch: SpeculativePrefetch | None = None,
+    ) -> int | None:
         if not telefone:
             return None
 
@@ -165,8 +348,34 @@ class AgriculturalMultiAgentService:
         if not name:
             return None
 
-        products_response = self.proraf.listar_produtos(telefone)
-        products = products_response.get("products", []) if isinstance(products_response, dict) else []
+        with span("resolve_product", name=name) as current:
+            # Com o espelho local, produtos conhecidos não precisam de ida ao ProRAF.
+            product_id = self.mirror.lookup(telefone, name) if self.mirror is not None else None
+            current.set(mirror_hit=product_id is not None)
+            if product_id is None:
+                product_id = self._find_or_create_product(telefone, name, request_body, prefetch)
+            current.set(product_id=product_id)
+        return product_id
+
+    def _mirror_created(self, telefone: str, created: Any, name: str) -> None:
+        if self.mirror is not None and isinstance(created, dict) and created.get("product_id") is not None:
+            self.mirror.add(telefone, created["product_id"], name)
+
+    def _find_or_create_product(
+        self,
+        telefone: str,
+        name: str,
+        request_body: dict[str, Any],
+        prefetch: SpeculativePrefetch | None,
+    ) -> int | None:
+        products_response = (prefetch or self.proraf).listar_produtos(telefone)
+        if _failed(products_response):
+            # Sem o catálogo não dá para saber se o produto existe: criar agora duplicaria.
+            raise _UpstreamFailure(_as_error(products_response))
+        products = products_response.get("products", [])
+        if self.mirror is not None:
+            # Falta no espelho: o catálogo já foi buscado, então passa a ficar espelhado.
+            self.mirror.replace(telefone, products)
 
         target = name.casefold()
         for item in products:
@@ -181,15 +390,18 @@ class AgriculturalMultiAgentService:
             descricao=request_body.get("description"),
             variedade=request_body.get("variedade_cultivar"),
         )
+        if _failed(created):
+            raise _UpstreamFailure(_as_error(created))
 
-        if isinstance(created, dict):
-            created_id = created.get("product_id")
-            if created_id is not None:
-                return int(created_id)
+        created_id = created.get("product_id")
+        if created_id is not None:
+            self._mirror_created(telefone, created, name)
+            return int(created_id)
 
         products_response = self.proraf.listar_produtos(telefone)
-        products = products_response.get("products", []) if isinstance(products_response, dict) else []
-        for item in products:
+        if _failed(products_response):
+            raise _UpstreamFailure(_as_error(products_response))
+        for item in products_response.get("products", []):
             product_name = str(item.get("name", "")).strip().casefold()
             if product_name == target:
                 product_id = item.get("id")
@@ -203,6 +415,7 @@ class AgriculturalMultiAgentService:
         operation: str,
         planner_output: dict[str, Any],
         api_result: dict[str, Any] | None = None,
+        telefone: str | None = None,
     ) -> str:
         payload = {
             "mensagem_usuario": user_message,
@@ -215,9 +428,87 @@ class AgriculturalMultiAgentService:
         return self._invoke_text(
             WHATSAPP_MESSAGE_PROMPT,
             json.dumps(payload, ensure_ascii=False),
+            stage="whatsapp_message",
+            telefone=telefone,
         )
 
-    def process_message(self, user_message: str, telefone: str | None = None) -> dict[str, Any] | int:
+    def plan(
+        self,
+        user_message: str,
+        telefone: str | None = None,
+        historico: str | None = None,
+        use_cache: bool = True,
+        usage_key: str | None = None,
+    ) -> dict[str, Any] | int:
+        """
+        Executa o planner, reaproveitando planos já gerados para a mesma entrada.
+        `usage_key` permite atribuir o consumo de tokens a outra chave que não o
+        telefone (usado pelo harness de avaliação).
+
+        Com `PLANNER_TWO_STAGE`, a intenção é identificada localmente primeiro:
+        consultas simples não chamam o modelo e escritas usam um prompt estreito
+        da operação; o prompt completo fica para o que não for reconhecido.
+        """
+        planner_input = {
+            "mensagem_usuario": user_message,
+            "telefone_contexto": telefone,
+        }
+        if historico:
+            planner_input["historico"] = historico
+        planner_payload = json.dumps(planner_input, ensure_ascii=False)
+
+        intent = classify_intent(user_message) if settings.planner_two_stage else None
+        with span("planner", intent=intent) as current:
+            if intent is not None and intent not in NARROW_PROMPTS:
+                self.planner_routing.record_local(intent, planner_payload)
+                current.set(route="local", operation=intent)
+                return local_plan(intent, telefone)
+
+            system_prompt = NARROW_PROMPTS.get(intent or "", CRUD_PLANNER_PROMPT)
+            digest = hashlib.sha256(f"{system_prompt}\n{planner_payload}".encode("utf-8")).hexdigest()
+            cache_key = f"planner:{digest}"
+            if use_cache:
+                cached = self.cache.get(cache_key)
+                current.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return cached
+
+            planner_output: dict[str, Any] | int = 0
+            if intent is not None:
+                planner_output = self._invoke_json(
+                    system_prompt, planner_payload, f"planner_{intent}", usage_key or telefone
+                )
+                accepted = accepts(intent, planner_output)
+                self.planner_routing.record_narrow(intent, accepted)
+                current.set(route="narrow" if accepted else "fallback")
+            if intent is None or not accepts(intent, planner_output):
+                self.planner_routing.record_full()
+                if intent is None:
+                    current.set(route="full")
+                planner_output = self._invoke_json(
+                    CRUD_PLANNER_PROMPT, planner_payload, "planner", usage_key or telefone
+                )
+            if isinstance(planner_output, dict):
+                current.set(operation=planner_output.get("operation"), api_method=planner_output.get("api_method"))
+            else:
+                current.fail("Planner sem resposta válida")
+            if use_cache and isinstance(planner_output, dict):
+                self.cache.set(cache_key, planner_output, ttl=settings.planner_cache_ttl_seconds)
+            return planner_output
+
+    def process_message(
+        self,
+        user_message: str,
+        telefone: str | None = None,
+        profile: str = "full",
+    ) -> dict[str, Any] | int:
+        """
+        Executa o fluxo completo. O `profile` define quais campos a resposta terá
+        e, com isso, quais etapas rodam:
+        - whatsapp: apenas `whatsapp_message` e `operation` (não gera `assistant_message`)
+        - full: resposta completa com `planner`, `api_result` e `assistant_message`
+        - debug: igual a full, mais o `request_body` executado e o tempo de cada etapa
+        """
         if self.client is None:
             return {
                 "error": "OPENAI_API_KEY não configurada. Defina no arquivo .env para usar /mensagem."
@@ -228,69 +519,191 @@ class AgriculturalMultiAgentService:
                 "error": "SECRET_KEY do ProRAF não configurada no .env. Defina PRORAF_SECRET_KEY ou SECRET_KEY.",
             }
 
-        planner_input = {
-            "mensagem_usuario": user_message,
-            "telefone_contexto": telefone,
+        if telefone:
+            self.activity.touch(telefone)
+
+        in_conversation = settings.memory_enabled and bool(telefone) and self.memory.has_turns(telefone)
+        category = self.gate.check(user_message, telefone, in_conversation)
+        current_span().set(telefone=telefone, profile=profile, gate=category)
+        if category is not None:
+            return self._gate_response(category, profile)
+
+        prefetch = self._start_prefetch(telefone)
+        try:
+            return self._process(user_message, telefone, profile, prefetch)
+        finally:
+            if prefetch is not None:
+                prefetch.close()
+
+    @staticmethod
+    def _gate_response(category: str, profile: str) -> dict[str, Any]:
+        """Resposta pronta para mensagens barradas pelo filtro, no mesmo formato do fluxo `none`."""
+        reply = GATE_REPLIES[category]
+        response: dict[str, Any] = {"whatsapp_message": reply, "operation": "none"}
+        if profile == "whatsapp":
+            return response
+        response["planner"] = {
+            "operation": "none",
+            "api_method": None,
+            "request_body": {},
+            "reason": f"Mensagem de conversa ({category}) respondida sem IA.",
         }
-        planner_output = self._invoke_json(
-            CRUD_PLANNER_PROMPT,
-            json.dumps(planner_input, ensure_ascii=False),
-        )
+        response["assistant_message"] = reply
+        if profile == "debug":
+            response["gate"] = category
+        return response
+
+    def _start_prefetch(self, telefone: str | None) -> SpeculativePrefetch | None:
+        """Dispara a pré-busca do catálogo e da verificação do telefone, em paralelo ao planner."""
+        # JIDs de grupo/LID não são telefones do ProRAF: não vale especular.
+        if not settings.prefetch_enabled or not telefone or "@" in telefone:
+            return None
+        return SpeculativePrefetch(self.proraf, self._prefetch_executor, self.prefetch_stats, telefone)
+
+    def _process(
+        self,
+        user_message: str,
+        telefone: str | None,
+        profile: str,
+        prefetch: SpeculativePrefetch | None,
+    ) -> dict[str, Any] | int:
+        with_assistant = profile != "whatsapp"
+        timings: dict[str, Any] = {}
+
+        started_at = time.perf_counter()
+        use_memory = settings.memory_enabled and bool(telefone)
+        historico = self.memory.summary(telefone) if use_memory else None
+        planner_output = self.plan(user_message, telefone, historico)
+        timings["planner_ms"] = _elapsed_ms(started_at)
         if not isinstance(planner_output, dict):
             return 0
+        if use_memory:
+            self.memory.add_turn(telefone, user_message, planner_output)
 
         operation = planner_output.get("operation", "none")
         api_method = planner_output.get("api_method")
         request_body = planner_output.get("request_body", {})
-        if not isinstance(request_body, dict):
-            request_body = {}
+        # Cópia: o plano pode ter vindo do cache e não deve ser alterado.
+        request_body = dict(request_body) if isinstance(request_body, dict) else {}
 
         if telefone and not request_body.get("telefone"):
             request_body["telefone"] = telefone
+        if request_body.get("telefone"):
+            request_body["telefone"] = normalize_phone(str(request_body["telefone"]))
 
         if operation == "none" or not api_method or api_method == "null":
-            human = self._invoke_text(
-                CRUD_RESULT_MESSAGE_PROMPT,
-                json.dumps(
-                    {
-                        "mensagem_usuario": user_message,
-                        "resultado_api": {"info": "Sem operação CRUD identificada"},
-                    },
-                    ensure_ascii=False,
-                ),
-            )
-            whatsapp_message = self._build_whatsapp_message(
-                user_message, "none", planner_output
+            fallback = "Não identifiquei uma ação de cadastro/consulta. Pode me dizer o que deseja fazer?"
+            operation = "none"
+            api_result = None
+            shaped_result = None
+            human_message_payload = {
+                "mensagem_usuario": user_message,
+                "resultado_api": {"info": "Sem operação CRUD identificada"},
+            }
+        else:
+            fallback = "Concluí a operação e já tenho o resultado da API."
+            started_at = time.perf_counter()
+            with span("crud", api_method=str(api_method)) as current:
+                api_result = self._execute_crud(str(api_method), request_body, prefetch)
+                if isinstance(api_result, dict):
+                    if api_result.get("error"):
+                        current.fail(str(api_result["error"]))
+                    current.set(queued=bool(api_result.get("queued")))
+            timings["crud_ms"] = _elapsed_ms(started_at)
+            # Os prompts recebem só os campos que usam, com listas cortadas e teto de tokens.
+            shaped_result = shape_api_result(
+                str(api_method),
+                api_result,
+                max_tokens=settings.llm_result_token_budget,
+                max_items=settings.llm_result_max_items,
             )
-            return {
-                "whatsapp_message": whatsapp_message
-                or "Não identifiquei uma ação de cadastro/consulta. Pode me dizer o que deseja fazer?",
-                "operation": "none",
-                "planner": planner_output,
-                "assistant_message": human
-                or "Não identifiquei uma ação de cadastro/consulta. Pode me dizer o que deseja fazer?",
+            human_message_payload = {
+                "mensagem_usuario": user_message,
+                "operation": operation,
+                "request_body": request_body,
+                "resultado_api": shaped_result,
             }
 
-        api_result = self._execute_crud(str(api_method), request_body)
+        # Leituras com o mesmo resultado geram o mesmo texto: reaproveita a resposta renderizada.
+        reply_cache_key = None
+        cached_reply = None
+        if api_method in READ_ONLY_METHODS and isinstance(api_result, dict) and "error" not in api_result:
+            reply_cache_key = _reply_cache_key(str(api_method), user_message, operation, request_body, api_result)
+            cached_reply = self.cache.get(reply_cache_key)
+            if cached_reply is not None and with_assistant and not cached_reply.get("assistant_message"):
+                cached_reply = None
+            # Chamado das threads da lane: o += precisa de lock.
+            with self._reply_cache_lock:
+                self.reply_cache_stats["hits" if cached_reply is not None else "misses"] += 1
+            current_span().set(reply_cache_hit=cached_reply is not None)
+
+        if cached_reply is not None:
+            human_message = cached_reply.get("assistant_message", "")
+            whatsapp_message = cached_reply["whatsapp_message"]
+            timings["reply_cache_hit"] = True
+        else:
+            human_message = ""
+            if with_assistant:
+                started_at = time.perf_counter()
+                human_message = self._invoke_text(
+                    CRUD_RESULT_MESSAGE_PROMPT,
+                    json.dumps(human_message_payload, ensure_ascii=False),
+                    stage="assistant_message",
+                    telefone=telefone,
+                )
+                timings["assistant_message_ms"] = _elapsed_ms(started_at)
 
-        human_message_payload = {
-            "mensagem_usuario": user_message,
-            "operation": operation,
-            "request_body": request_body,
-            "resultado_api": api_result,
-        }
-        human_message = self._invoke_text(
-            CRUD_RESULT_MESSAGE_PROMPT,
-            json.dumps(human_message_payload, ensure_ascii=False),
-        )
-        whatsapp_message = self._build_whatsapp_message(
-            user_message, operation, planner_output, api_result
-        )
+            started_at = time.perf_counter()
+            whatsapp_message = self._build_whatsapp_message(
+                user_message, operation, planner_output, shaped_result, telefone
+            )
+            timings["whatsapp_message_ms"] = _elapsed_ms(started_at)
 
-        return {
-            "whatsapp_message": whatsapp_message or "Concluí a operação e já tenho o resultado da API.",
+            if reply_cache_key and whatsapp_message and (human_message or not with_assistant):
+                self.cache.set(
+                    reply_cache_key,
+                    {"whatsapp_message": whatsapp_message, "assistant_message": human_message},
+                    ttl=settings.reply_cache_ttl_seconds,
+                )
+
+        response: dict[str, Any] = {
+            "whatsapp_message": whatsapp_message or fallback,
             "operation": operation,
-            "planner": planner_output,
-            "api_result": api_result,
-            "assistant_message": human_message or "Concluí a operação e já tenho o resultado da API.",
         }
+        if not with_assistant:
+            return response
+
+        response["planner"] = planner_output
+        if api_result is not None:
+            response["api_result"] = api_result
+        response["assistant_message"] = human_message or fallback
+        if profile == "debug":
+            response["request_body"] = request_body
+            response["timings_ms"] = timings
+        return response
+
+
+def _reply_cache_key(
+    api_method: str,
+    user_message: str,
+    operation: str,
+    request_body: dict[str, Any],
+    api_result: dict[str, Any],
+) -> str:
+    """
+    Chave da resposta renderizada: tudo que entra nos prompts de resposta (mensagem
+    normalizada, operação, request_body com o telefone e resultado) + versão dos prompts.
+    Assim uma resposta nunca é servida a outro telefone nem a outra pergunta.
+    """
+    content = json.dumps(
+        [normalize(user_message or ""), operation, request_body, api_result],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(f"{_REPLY_PROMPTS_DIGEST}\n{content}".encode("utf-8")).hexdigest()
+    return f"reply:{api_method}:{digest}"
+
+
+def _elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
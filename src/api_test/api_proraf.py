@@ -7,24 +7,72 @@ from __future__ import annotations
 
 import hashlib
 import hmac
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Any
 
 import requests
 
+from api_test.cache import CacheBackend, NullCache
+from api_test.health import Upstream
+from api_test.phone import normalize_phone
+from api_test.tracing import span
+
+
+# Talhão usado quando o produtor não informa um (chat e importação em massa).
+DEFAULT_TALHAO = "Talhão A"
+
+
+@lru_cache(maxsize=4096)
+def _hmac_sha256(secret_key: str, telefone: str) -> str:
+    return hmac.new(secret_key.encode('utf-8'), telefone.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """Circuito aberto: a chamada falha na hora, sem ir ao ProRAF."""
+
 
 class ProrafAPI:
-    def __init__(self, base_url: str, secret_key: str, api_key: str = "", timeout: int = 30):
+    # Quantidade máxima de respostas guardadas para revalidação condicional.
+    MAX_VALIDATORS = 4096
+
+    def __init__(
+        self,
+        base_url: str,
+        secret_key: str,
+        api_key: str = "",
+        timeout: int = 30,
+        cache: CacheBackend | None = None,
+        upstream: Upstream | None = None,
+    ):
         """
         Inicializa o cliente da API Proraf com autenticação HMAC-SHA256
         
         Args:
             base_url: URL base da API Proraf 
             secret_key: Chave secreta para gerar hashes HMAC (deve ser a mesma do servidor)
+            cache: Backend de cache para leituras (verificar_telefone e listar_produtos)
+            upstream: Latências e circuit breaker das chamadas ao ProRAF (opcional)
         """
         self.base_url = base_url.rstrip("/")
         self.secret_key = secret_key
         self.api_key = api_key
         self.timeout = timeout
+        self.cache = cache or NullCache()
+        self.upstream = upstream
+        # Sessão compartilhada: reaproveita conexões TCP/TLS entre chamadas (keep-alive).
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip"
+        # Validadores HTTP (ETag/Last-Modified) + corpo já parseado das leituras de catálogo.
+        self._validators: OrderedDict[str, tuple[str | None, str | None, Any]] = OrderedDict()
+        self._validators_lock = threading.Lock()
+        self.conditional_stats = {"not_modified": 0, "modified": 0}
+        # Geração do catálogo por telefone: sobe a cada invalidação, para que uma leitura
+        # iniciada antes de uma escrita (ex: pré-busca) não grave o catálogo antigo no cache.
+        self._catalog_generations: dict[str, int] = {}
+        self._generations_lock = threading.Lock()
 
     def _headers(self) -> dict[str, str]:
         headers = {"Content-Type": "application/json"}
@@ -35,7 +83,82 @@ class ProrafAPI:
     def _request(self, method: str, endpoint: str, **kwargs: Any) -> requests.Response:
         kwargs.setdefault("timeout", self.timeout)
         kwargs.setdefault("headers", self._headers())
-        return requests.request(method=method, url=f"{self.base_url}{endpoint}", **kwargs)
+        upstream = self.upstream
+        if upstream is not None and not upstream.allow():
+            raise CircuitOpen("Circuito aberto para o ProRAF: muitas falhas seguidas, tente novamente em instantes.")
+        with span("proraf.request", method=method, endpoint=endpoint) as current:
+            started_at = time.perf_counter()
+            try:
+                response = self.session.request(method=method, url=f"{self.base_url}{endpoint}", **kwargs)
+            except requests.exceptions.RequestException:
+                if upstream is not None:
+                    upstream.record((time.perf_counter() - started_at) * 1000, ok=False)
+                raise
+            if upstream is not None:
+                upstream.record((time.perf_counter() - started_at) * 1000, ok=response.status_code < 500)
+            current.set(status_code=response.status_code)
+            if response.status_code >= 500:
+                current.fail(f"HTTP {response.status_code}")
+            return response
+
+    def _conditional_request(self, key: str, method: str, endpoint: str, **kwargs: Any) -> tuple[requests.Response, Any]:
+        """
+        Faz a requisição com If-None-Match/If-Modified-Since quando já houver validador.
+        Em 304 devolve o corpo guardado, sem baixar nem parsear de novo.
+        
+        Returns:
+            (response, data) — data é None quando a resposta não foi 2xx/304
+        """
+        with self._validators_lock:
+            validator = self._validators.get(key)
+        headers = self._headers()
+        if validator is not None:
+            etag, last_modified, _ = validator
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = self._request(method, endpoint, headers=headers, **kwargs)
+        if response.status_code == 304 and validator is not None:
+            self.conditional_stats["not_modified"] += 1
+            with self._validators_lock:
+                self._validators.move_to_end(key)
+            return response, validator[2]
+        if not 200 <= response.status_code < 300:
+            return response, None
+
+        self.conditional_stats["modified"] += 1
+        data = response.json()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._validators_lock:
+            if etag or last_modified:
+                self._validators[key] = (etag, last_modified, data)
+                self._validators.move_to_end(key)
+                while len(self._validators) > self.MAX_VALIDATORS:
+                    self._validators.popitem(last=False)
+            else:
+                self._validators.pop(key, None)
+        return response, data
+
+    def warm_up(self, timeout: float = 5) -> bool:
+        """
+        Abre a conexão com o backend (DNS, TLS e pool) chamando /health
+        
+        Returns:
+            True se o backend respondeu, False caso contrário
+        """
+        try:
+            return self.ping(timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"[WARMUP] Falha ao aquecer conexão com ProRAF: {e}")
+            return False
+
+    def ping(self, timeout: float = 5) -> bool:
+        """Chama /health do backend; True se respondeu sem erro 5xx (exceções de rede sobem)."""
+        response = self._request("GET", "/health", timeout=timeout)
+        return response.status_code < 500
 
     def gerar_hash(self, telefone: str) -> str:
         """
@@ -45,26 +168,46 @@ class ProrafAPI:
             telefone: Número de telefone do usuário
             
         Returns:
-            Hash hexadecimal para autenticação
+            Hash hexadecimal para autenticação (memoizado em LRU limitado)
         """
-        hash_object = hmac.new(
-            self.secret_key.encode('utf-8'),
-            telefone.encode('utf-8'),
-            hashlib.sha256
-        )
-        generated_hash = hash_object.hexdigest()
+        generated_hash = _hmac_sha256(self.secret_key, telefone)
         print(f"[DEBUG] Hash gerado para {telefone}: {generated_hash[:20]}...")
         return generated_hash
 
+    def invalidar_produtos(self, telefone: str) -> None:
+        """Remove do cache (em todos os workers, se compartilhado) o catálogo do telefone"""
+        telefone = normalize_phone(telefone)
+        with self._generations_lock:
+            self._catalog_generations[telefone] = self._catalog_generations.get(telefone, 0) + 1
+        self.cache.delete(f"listar_produtos:{telefone}")
+
+    def _catalog_generation(self, telefone: str) -> int:
+        with self._generations_lock:
+            return self._catalog_generations.get(telefone, 0)
+
+    def _cache_catalog(self, telefone: str, data: Any, generation: int, ttl: float | None = None) -> bool:
+        """Grava o catálogo no cache, a menos que ele tenha sido invalidado depois do início da leitura."""
+        cache_key = f"listar_produtos:{telefone}"
+        if self._catalog_generation(telefone) != generation:
+            return False
+        self.cache.set(cache_key, data, ttl=ttl)
+        if self._catalog_generation(telefone) != generation:
+            # A invalidação chegou entre a checagem e a gravação.
+            self.cache.delete(cache_key)
+            return False
+        return True
+
     def listar_telefones(self):
         """Lista todos os telefones cadastrados no sistema"""
         # Hash especial para listagem de telefones
         hash_list = self.gerar_hash("PHONE_LIST")
         
         try:
-            response = self._request("GET", "/whatsapp/phones", params={"hash": hash_list})
+            response, data = self._conditional_request(
+                "listar_telefones", "GET", "/whatsapp/phones", params={"hash": hash_list}
+            )
             response.raise_for_status()
-            return response.json()
+            return data
         except requests.exceptions.RequestException as e:
             print(f"Erro ao listar telefones: {e}")
             return {"error": str(e), "telefones": []}
@@ -79,6 +222,12 @@ class ProrafAPI:
         Returns:
             Dict com exists, user_id, nome, email, tipo_pessoa
         """
+        telefone = normalize_phone(telefone)
+        cache_key = f"verificar_telefone:{telefone}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         hash_auth = self.gerar_hash(telefone)
         
         print(f"[DEBUG] Verificando telefone: {telefone}")
@@ -97,7 +246,10 @@ class ProrafAPI:
             print(f"[DEBUG] Status code: {response.status_code}")
             print(f"[DEBUG] Response: {response.text[:200]}")
             response.raise_for_status()
-            return response.json()
+            data = response.json()
+            if isinstance(data, dict) and "error" not in data:
+                self.cache.set(cache_key, data)
+            return data
         except requests.exceptions.Timeout:
             print(f"[ERROR] Timeout ao verificar telefone: {telefone}")
             return {"error": "Timeout", "exists": False}
@@ -121,6 +273,7 @@ class ProrafAPI:
         Returns:
             Dict com success, product_id, product_name, qrcode_url
         """
+        telefone = normalize_phone(telefone)
         hash_auth = self.gerar_hash(telefone)
         
         payload = {
@@ -136,6 +289,7 @@ class ProrafAPI:
         
         try:
             response = self._request("POST", "/whatsapp/create-product", json=payload)
+            self.invalidar_produtos(telefone)
             
             print(f"[DEBUG] Status Code: {response.status_code}")
             print(f"[DEBUG] Response text: {response.text[:500]}")
@@ -185,6 +339,13 @@ class ProrafAPI:
         Returns:
             Dict com success e lista de produtos
         """
+        telefone = normalize_phone(telefone)
+        cache_key = f"listar_produtos:{telefone}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        generation = self._catalog_generation(telefone)
         hash_auth = self.gerar_hash(telefone)
         
         payload = {
@@ -195,25 +356,90 @@ class ProrafAPI:
         print(f"[DEBUG] Listando produtos para: {telefone}")
         
         try:
-            response = self._request("POST", "/whatsapp/list-products", json=payload)
+            response, data = self._conditional_request(
+                f"listar_produtos:{telefone}", "POST", "/whatsapp/list-products", json=payload
+            )
             
             if response.status_code >= 400:
                 try:
                     error_data = response.json()
                     print(f"[ERROR] Erro ao listar produtos: {error_data}")
-                    return {"error": error_data.get("detail", response.text), "success": False, "products": []}
+                    return {
+                        "error": error_data.get("detail", response.text),
+                        "success": False,
+                        "products": [],
+                        "status_code": response.status_code,
+                    }
                 except:
-                    return {"error": response.text, "success": False, "products": []}
+                    return {"error": response.text, "success": False, "products": [], "status_code": response.status_code}
             
             response.raise_for_status()
-            data = response.json()
             print(f"[DEBUG] Produtos encontrados: {len(data.get('products', []))}")
+            if isinstance(data, dict) and "error" not in data:
+                self._cache_catalog(telefone, data, generation)
             return data
             
         except Exception as e:
             print(f"[ERROR] Erro ao listar produtos: {e}")
             return {"error": str(e), "success": False, "products": []}
     
+    def listar_produtos_sem_cache(self, telefone: str, etag: str | None = None, last_modified: str | None = None):
+        """
+        Lista os produtos sem passar pelo cache TTL nem pelos validadores do cliente,
+        para leitores em massa (espelho, exportação) que não devem ocupar esses espaços.
+        
+        Args:
+            telefone: Número de telefone do usuário
+            etag / last_modified: Validadores guardados pelo chamador (requisição condicional)
+            
+        Returns:
+            Dict do ProRAF acrescido de `etag`/`last_modified`, {"not_modified": True} em 304,
+            ou dict com `error`
+        """
+        telefone = normalize_phone(telefone)
+        headers = self._headers()
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        payload = {"telefone": telefone, "hash": self.gerar_hash(telefone)}
+
+        try:
+            response = self._request("POST", "/whatsapp/list-products", json=payload, headers=headers)
+            if response.status_code == 304:
+                return {"not_modified": True}
+            if response.status_code >= 400:
+                try:
+                    detail = response.json().get("detail", response.text)
+                except Exception:
+                    detail = response.text
+                return {"error": detail, "success": False, "products": [], "status_code": response.status_code}
+            data = response.json()
+            if not isinstance(data, dict):
+                return {"error": "Resposta inválida do ProRAF", "success": False, "products": []}
+            data["etag"] = response.headers.get("ETag")
+            data["last_modified"] = response.headers.get("Last-Modified")
+            return data
+        except Exception as e:
+            print(f"[ERROR] Erro ao listar produtos sem cache: {e}")
+            return {"error": str(e), "success": False, "products": []}
+
+    def aquecer_produtos(self, telefone: str, ttl: float) -> bool:
+        """
+        Busca o catálogo atual (sem cache) e grava no cache com o TTL informado
+        
+        Returns:
+            True se o catálogo foi gravado
+        """
+        telefone = normalize_phone(telefone)
+        generation = self._catalog_generation(telefone)
+        data = self.listar_produtos_sem_cache(telefone)
+        if "error" in data or data.get("not_modified"):
+            return False
+        data.pop("etag", None)
+        data.pop("last_modified", None)
+        return self._cache_catalog(telefone, data, generation, ttl=ttl)
+
     def atualizar_produto(self, telefone: str, product_id: int, description=None, comertial_name=None):
         """
         Atualiza informações de um produto
@@ -227,6 +453,7 @@ class ProrafAPI:
         Returns:
             Dict com success e dados do produto atualizado
         """
+        telefone = normalize_phone(telefone)
         hash_auth = self.gerar_hash(telefone)
         
         payload = {
@@ -244,14 +471,19 @@ class ProrafAPI:
         
         try:
             response = self._request("PUT", "/whatsapp/update-product", json=payload)
+            self.invalidar_produtos(telefone)
             
             if response.status_code >= 400:
                 try:
                     error_data = response.json()
                     print(f"[ERROR] Erro ao atualizar produto: {error_data}")
-                    return {"error": error_data.get("detail", response.text), "success": False}
+                    return {
+                        "error": error_data.get("detail", response.text),
+                        "success": False,
+                        "status_code": response.status_code
+                    }
                 except:
-                    return {"error": response.text, "success": False}
+                    return {"error": response.text, "success": False, "status_code": response.status_code}
             
             response.raise_for_status()
             return response.json()
@@ -277,6 +509,7 @@ class ProrafAPI:
         Returns:
             Dict com success, batch_id e batch_number
         """
+        telefone = normalize_phone(telefone)
         hash_auth = self.gerar_hash(telefone)
         
         payload = {
@@ -306,9 +539,13 @@ class ProrafAPI:
                 try:
                     error_data = response.json()
                     print(f"[ERROR] Resposta de erro da API: {error_data}")
-                    return {"error": error_data.get("detail", response.text), "success": False}
+                    return {
+                        "error": error_data.get("detail", response.text),
+                        "success": False,
+                        "status_code": response.status_code
+                    }
                 except:
-                    return {"error": response.text, "success": False}
+                    return {"error": response.text, "success": False, "status_code": response.status_code}
             
             response.raise_for_status()
             return response.json()
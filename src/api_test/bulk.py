@@ -0,0 +1,331 @@
+"""
+Este arquivo implementa as operações em lote com o ProRAF, sem passar pela IA.
+A ideia é importar planilhas de colheita (CSV ou JSONL) linha a linha, sem
+carregar o arquivo inteiro na memória: cada linha vira um `criar_lote`, com
+os produtos resolvidos por um catálogo em cache por telefone e concorrência
+limitada. O resultado de cada linha é devolvido em NDJSON assim que termina.
+No sentido inverso, a exportação percorre todos os telefones e devolve o
+catálogo de cada um em NDJSON, com cursor para retomar se for interrompida.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import json
+import tempfile
+import threading
+from collections import deque
+from typing import Any, AsyncIterator
+
+from api_test.api_proraf import DEFAULT_TALHAO
+from api_test.phone import extract_phones, normalize_phone
+
+# Nomes aceitos para cada coluna da planilha (comparados sem caixa e sem acento no "talhão").
+_COLUMN_ALIASES: dict[str, tuple[str, ...]] = {
+    "telefone": ("telefone", "phone", "celular"),
+    "product_id": ("product_id", "produto_id"),
+    "name": ("produto", "product_name", "name", "nome"),
+    "talhao": ("talhao", "talhão", "area"),
+    "producao": ("producao", "produção", "quantidade"),
+    "unidadeMedida": ("unidademedida", "unidade", "unidade_medida"),
+    "dt_plantio": ("dt_plantio", "data_plantio", "plantio"),
+    "dt_colheita": ("dt_colheita", "data_colheita", "colheita"),
+}
+
+_ALIAS_TO_FIELD = {alias: field for field, aliases in _COLUMN_ALIASES.items() for alias in aliases}
+
+# Corpo recebido fica em memória até este tamanho; acima disso vai para disco.
+_SPOOL_MAX_MEMORY = 1024 * 1024
+_CHUNK_SIZE = 64 * 1024
+
+
+async def spool_body(chunks: AsyncIterator[bytes]) -> tempfile.SpooledTemporaryFile:
+    """
+    Guarda o corpo da requisição num arquivo temporário antes de responder.
+    A resposta em streaming também lê o canal da requisição (para detectar
+    desconexão), então o corpo precisa ser consumido antes dela começar.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY)
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def aiter_chunks(file: Any) -> AsyncIterator[bytes]:
+    while chunk := await asyncio.to_thread(file.read, _CHUNK_SIZE):
+        yield chunk
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Quebra o corpo recebido em linhas de texto, sem juntar o arquivo inteiro."""
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            text = line.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+            first = False
+            yield text
+    if buffer:
+        yield buffer.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+
+
+async def aiter_rows(lines: AsyncIterator[str], formato: str) -> AsyncIterator[tuple[int, dict[str, Any] | None]]:
+    """
+    Converte as linhas em dicionários `(numero_linha, dados)`; `dados` é None
+    quando a linha não pôde ser lida. No CSV, a primeira linha é o cabeçalho
+    e o separador (`,` ou `;`) é detectado nela.
+    """
+    header: list[str] | None = None
+    delimiter = ","
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+
+        if formato == "jsonl":
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                yield number, None
+                continue
+            yield number, data if isinstance(data, dict) else None
+            continue
+
+        if header is None:
+            delimiter = ";" if line.count(";") > line.count(",") else ","
+            header = [column.strip() for column in next(csv.reader([line], delimiter=delimiter))]
+            continue
+        values = next(csv.reader([line], delimiter=delimiter))
+        yield number, dict(zip(header, values))
+
+
+def normalize_row(raw: dict[str, Any]) -> dict[str, Any]:
+    """Mapeia as colunas da planilha para os campos de `criar_lote`."""
+    row: dict[str, Any] = {}
+    for key, value in raw.items():
+        field = _ALIAS_TO_FIELD.get(str(key).strip().casefold())
+        if field is None or value is None:
+            continue
+        value = value.strip() if isinstance(value, str) else value
+        if value != "":
+            row[field] = value
+    if "telefone" in row:
+        row["telefone"] = normalize_phone(str(row["telefone"]))
+    return row
+
+
+class PhoneCatalog:
+    """
+    Catálogo de produtos por telefone, carregado uma vez por importação.
+    Produtos ausentes são criados uma única vez, mesmo com linhas concorrentes.
+    """
+
+    def __init__(self, proraf: Any) -> None:
+        self.proraf = proraf
+        self._products: dict[str, dict[str, int]] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, telefone: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(telefone, threading.Lock())
+
+    def _load(self, telefone: str) -> tuple[dict[str, int] | None, dict[str, Any] | None]:
+        """Devolve `(produtos por nome, None)` ou `(None, erro do ProRAF)`."""
+        response = self.proraf.listar_produtos(telefone)
+        if not isinstance(response, dict):
+            return None, {"success": False, "error": "Resposta inválida do ProRAF"}
+        if "error" in response:
+            return None, response
+        products = {
+            str(item.get("name", "")).strip().casefold(): int(item["id"])
+            for item in response.get("products", [])
+            if item.get("id") is not None
+        }
+        return products, None
+
+    def resolve(self, telefone: str, name: str) -> int | dict[str, Any] | None:
+        """
+        Devolve o id do produto, ou o erro do ProRAF se o catálogo não puder ser
+        lido ou o produto não puder ser criado. A falha não fica guardada: a
+        próxima linha do telefone tenta carregar o catálogo de novo.
+        """
+        target = name.strip().casefold()
+        with self._lock(telefone):
+            products = self._products.get(telefone)
+            if products is None:
+                products, error = self._load(telefone)
+                if error is not None:
+                    # Sem catálogo, criar o produto duplicaria um que já existe.
+                    return error
+                self._products[telefone] = products
+            if target in products:
+                return products[target]
+
+            created = self.proraf.criar_produto(telefone=telefone, nome=name.strip())
+            if isinstance(created, dict) and "error" in created:
+                return created
+            created_id = created.get("product_id") if isinstance(created, dict) else None
+            if created_id is None:
+                return None
+            products[target] = int(created_id)
+            return products[target]
+
+
+class HarvestImporter:
+    """Executa `criar_lote` para cada linha, com no máximo `max_concurrency` em andamento."""
+
+    def __init__(self, proraf: Any, max_concurrency: int) -> None:
+        self.proraf = proraf
+        self.max_concurrency = max(1, max_concurrency)
+        self.catalog = PhoneCatalog(proraf)
+
+    def import_row(self, row: dict[str, Any]) -> dict[str, Any]:
+        telefone = row.get("telefone")
+        producao = row.get("producao")
+        unidade = row.get("unidadeMedida")
+        if not telefone or producao is None or not unidade:
+            return {"success": False, "error": "Telefone, producao e unidadeMedida são obrigatórios."}
+        try:
+            producao = float(str(producao).replace(",", "."))
+        except ValueError:
+            return {"success": False, "error": f"Produção inválida: {row.get('producao')}"}
+
+        product_id = row.get("product_id")
+        if product_id is None:
+            if not row.get("name"):
+                return {"success": False, "error": "Produto (product_id ou nome) é obrigatório."}
+            product_id = self.catalog.resolve(telefone, str(row["name"]))
+            if isinstance(product_id, dict):
+                return product_id
+            if product_id is None:
+                return {"success": False, "error": f"Não foi possível encontrar ou criar o produto {row['name']}."}
+
+        return self.proraf.criar_lote(
+            telefone=telefone,
+            product_id=int(product_id),
+            talhao=str(row.get("talhao") or DEFAULT_TALHAO).strip(),
+            producao=producao,
+            unidadeMedida=str(unidade),
+            dt_plantio=row.get("dt_plantio"),
+            dt_colheita=row.get("dt_colheita"),
+        )
+
+    async def _run_row(self, number: int, raw: dict[str, Any] | None) -> dict[str, Any]:
+        if raw is None:
+            result: dict[str, Any] = {"success": False, "error": "Linha inválida."}
+            return {"type": "row", "linha": number, "result": result}
+        row = normalize_row(raw)
+        try:
+            result = await asyncio.to_thread(self.import_row, row)
+        except Exception as exc:
+            result = {"success": False, "error": f"Erro ao importar linha: {exc}"}
+        return {"type": "row", "linha": number, "telefone": row.get("telefone"), "result": result}
+
+    async def run(self, rows: AsyncIterator[tuple[int, dict[str, Any] | None]]) -> AsyncIterator[dict[str, Any]]:
+        """
+        Consome as linhas conforme há vaga e devolve cada resultado assim que
+        fica pronto (fora de ordem; use `linha`). Termina com um resumo.
+        """
+        pending: set[asyncio.Task] = set()
+        summary = {"type": "summary", "total": 0, "success": 0, "errors": 0}
+
+        def account(item: dict[str, Any]) -> dict[str, Any]:
+            summary["total"] += 1
+            ok = isinstance(item["result"], dict) and "error" not in item["result"]
+            summary["success" if ok else "errors"] += 1
+            return item
+
+        try:
+            async for number, raw in rows:
+                if len(pending) >= self.max_concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield account(task.result())
+                pending.add(asyncio.create_task(self._run_row(number, raw)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield account(task.result())
+        finally:
+            for task in pending:
+                task.cancel()
+
+        yield summary
+
+
+class CatalogExporter:
+    """
+    Exporta o catálogo de todos os telefones, em ordem de telefone. Até
+    `max_concurrency` catálogos são buscados à frente do que já foi enviado,
+    sem passar pelo cache de leituras, então a memória usada não depende do
+    tamanho da exportação.
+    """
+
+    def __init__(self, proraf: Any, max_concurrency: int) -> None:
+        self.proraf = proraf
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def run(self, cursor: str | None = None) -> AsyncIterator[dict[str, Any]]:
+        """
+        Uma linha `product` por produto e, ao fim de cada telefone, uma linha
+        `cursor`; para retomar, passe o último cursor recebido. O cursor só avança
+        enquanto não houver falha: depois do primeiro telefone com `error`, os
+        demais ainda são exportados, mas sem cursor, para que a retomada o inclua.
+        """
+        response = await asyncio.to_thread(self.proraf.listar_telefones)
+        if isinstance(response, dict) and response.get("error"):
+            yield {"type": "error", "error": response["error"]}
+            return
+
+        phones = sorted(set(extract_phones(response)))
+        if cursor:
+            cursor = normalize_phone(cursor)
+            phones = [phone for phone in phones if phone > cursor]
+
+        window: deque[tuple[str, asyncio.Task]] = deque()
+        remaining = iter(phones)
+        totals = {"type": "end", "phones": 0, "products": 0, "errors": 0}
+        failed = False
+
+        def fill() -> None:
+            while len(window) < self.max_concurrency:
+                telefone = next(remaining, None)
+                if telefone is None:
+                    return
+                window.append((telefone, asyncio.create_task(asyncio.to_thread(self.proraf.listar_produtos_sem_cache, telefone))))
+
+        try:
+            fill()
+            while window:
+                telefone, task = window.popleft()
+                try:
+                    result = await task
+                except Exception as exc:
+                    result = {"error": str(exc)}
+                fill()
+
+                if not isinstance(result, dict) or result.get("error"):
+                    error = result.get("error") if isinstance(result, dict) else "Resposta inválida do ProRAF"
+                    yield {"type": "error", "telefone": telefone, "error": error}
+                    totals["errors"] += 1
+                    failed = True
+                else:
+                    products = result.get("products") or []
+                    for product in products:
+                        yield {"type": "product", "telefone": telefone, "product": product}
+                    totals["products"] += len(products)
+                totals["phones"] += 1
+                if not failed:
+                    yield {"type": "cursor", "cursor": telefone}
+        finally:
+            for _, task in window:
+                task.cancel()
+
+        yield totals
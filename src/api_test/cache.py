@@ -0,0 +1,228 @@
+"""
+Este arquivo implementa os backends de cache da aplicação.
+A ideia é ter uma interface única com duas implementações: um LRU em memória
+(por processo) e um backend SQLite em modo WAL compartilhado por todos os
+workers do mesmo host, sem depender de serviço externo.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from api_test.settings import settings
+
+
+class CacheBackend:
+    """Interface comum dos caches. Valores precisam ser serializáveis em JSON."""
+
+    name = "none"
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any | None:
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        return None
+
+    def delete(self, key: str) -> None:
+        return None
+
+    def delete_prefix(self, prefix: str) -> None:
+        return None
+
+    def clear(self) -> None:
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class NullCache(CacheBackend):
+    """Cache desativado: nunca armazena nada."""
+
+
+class MemoryLRUCache(CacheBackend):
+    """LRU em memória com TTL por entrada. Não é compartilhado entre workers."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 120) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        data = super().stats()
+        data.update({"entries": len(self._data), "max_entries": self.max_entries})
+        return data
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache em arquivo SQLite (modo WAL) compartilhado entre processos.
+    Invalidações são visíveis imediatamente para todos os workers do host.
+    """
+
+    name = "sqlite"
+
+    # A cada N escritas, remove expirados e aplica o limite de tamanho.
+    PRUNE_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int = 10000, default_ttl: float = 120) -> None:
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Conexões SQLite não devem ser compartilhadas entre threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Any | None:
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as exc:
+            print(f"[CACHE] Erro ao ler chave {key}: {exc}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+        except sqlite3.Error as exc:
+            print(f"[CACHE] Erro ao gravar chave {key}: {exc}")
+
+    def _prune(self) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        (count,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self.max_entries:
+            # Remove primeiro as entradas mais próximas de expirar.
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY expires_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as exc:
+            print(f"[CACHE] Erro ao invalidar chave {key}: {exc}")
+
+    def delete_prefix(self, prefix: str) -> None:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (f"{escaped}%",))
+        except sqlite3.Error as exc:
+            print(f"[CACHE] Erro ao invalidar prefixo {prefix}: {exc}")
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM cache")
+
+    def stats(self) -> dict[str, Any]:
+        data = super().stats()
+        try:
+            (entries,) = self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()
+        except sqlite3.Error:
+            entries = None
+        data.update({"entries": entries, "max_entries": self.max_entries, "path": self.path})
+        return data
+
+
+def build_cache() -> CacheBackend:
+    """Cria o backend de cache configurado em `CACHE_BACKEND` (memory, sqlite ou none)."""
+    backend = settings.cache_backend.strip().lower()
+    if backend == "memory":
+        return MemoryLRUCache(
+            max_entries=settings.cache_max_entries,
+            default_ttl=settings.cache_ttl_seconds,
+        )
+    if backend == "sqlite":
+        return SQLiteCache(
+            path=settings.cache_sqlite_path,
+            max_entries=settings.cache_max_entries,
+            default_ttl=settings.cache_ttl_seconds,
+        )
+    return NullCache()
@@ -0,0 +1,290 @@
+"""
+Este arquivo implementa o harness de avaliação offline do planner.
+A ideia é rodar o planner sobre um corpus JSONL de mensagens com o plano
+esperado (`operation`, `api_method`, `request_body`), com paralelismo
+configurável, e gerar um relatório de acurácia, latência e tokens por
+intenção, com comparação opcional contra um baseline salvo.
+
+Uso:
+    python -m api_test.evaluation evaluation/planner_corpus.jsonl --parallel 8
+    python -m api_test.evaluation corpus.jsonl --stub --save-baseline baseline.json
+    python -m api_test.evaluation corpus.jsonl --baseline baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator
+
+from api_test.prompts import CRUD_PLANNER_PROMPT
+from api_test.usage import UsageTracker, estimate_tokens
+
+# Métricas comparadas com o baseline (maior é melhor para acurácia, menor para o resto).
+_DIFF_METRICS = (
+    "operation_accuracy",
+    "api_method_accuracy",
+    "body_field_accuracy",
+    "exact_match",
+    "latency_p50_ms",
+    "latency_p95_ms",
+    "prompt_tokens_avg",
+)
+
+_QUANTITY_RE = re.compile(
+    r"(?P<producao>\d+(?:[.,]\d+)?)\s*(?P<unidade>kg|quilos?|toneladas?|unidades?|caixas?|sacas?)"
+    r"(?:\s+de)?\s+(?P<name>[a-zà-ú]+)",
+    re.IGNORECASE,
+)
+_TALHAO_RE = re.compile(r"talh[aã]o\s+(?P<talhao>[\w-]+)", re.IGNORECASE)
+
+
+class StubPlanner:
+    """
+    Planner local baseado em regras, para validar o harness sem chamar a OpenAI.
+    Registra tokens estimados do prompt completo, como se fosse o modelo.
+    """
+
+    model = "stub"
+
+    def __init__(self) -> None:
+        self.usage = UsageTracker(max_phones=1_000_000)
+
+    def plan(
+        self,
+        user_message: str,
+        telefone: str | None = None,
+        historico: str | None = None,
+        use_cache: bool = True,
+        usage_key: str | None = None,
+    ) -> dict[str, Any]:
+        payload = json.dumps({"mensagem_usuario": user_message, "telefone_contexto": telefone}, ensure_ascii=False)
+        self.usage.record(
+            "planner",
+            self.model,
+            {"prompt_tokens": estimate_tokens(CRUD_PLANNER_PROMPT + payload), "completion_tokens": 60},
+            usage_key or telefone,
+        )
+
+        text = user_message.casefold()
+        body: dict[str, Any] = {"telefone": telefone}
+        quantity = _QUANTITY_RE.search(user_message)
+        if quantity:
+            talhao = _TALHAO_RE.search(user_message)
+            body.update(
+                {
+                    "product_id": None,
+                    "name": quantity.group("name").lower(),
+                    "talhao": f"Talhão {talhao.group('talhao').upper()}" if talhao else "Talhão A",
+                    "producao": float(quantity.group("producao").replace(",", ".")),
+                    "unidadeMedida": quantity.group("unidade").lower(),
+                    "dt_plantio": None,
+                    "dt_colheita": None,
+                }
+            )
+            return {"operation": "create_batch", "api_method": "criar_lote", "request_body": body}
+        if "produto" in text and any(word in text for word in ("listar", "liste", "quais", "meus")):
+            return {"operation": "list_products", "api_method": "listar_produtos", "request_body": body}
+        if "telefones" in text:
+            return {"operation": "list_phones", "api_method": "listar_telefones", "request_body": {}}
+        if "verific" in text and "telefone" in text:
+            return {"operation": "verify_phone", "api_method": "verificar_telefone", "request_body": body}
+        if any(word in text for word in ("cadastr", "criar", "crie", "adicion")):
+            name = text.split()[-1]
+            body["name"] = name
+            return {"operation": "create_product", "api_method": "criar_produto", "request_body": body}
+        return {"operation": "none", "api_method": None, "request_body": {}}
+
+
+def read_corpus(path: str) -> Iterator[dict[str, Any]]:
+    """Lê o corpus: uma mensagem por linha, com o plano esperado em `expected` ou na raiz."""
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line)
+            expected = item.get("expected") or item
+            yield {
+                "message": item["message"],
+                "telefone": item.get("telefone"),
+                "operation": expected.get("operation", "none"),
+                "api_method": expected.get("api_method"),
+                "request_body": expected.get("request_body") or {},
+            }
+
+
+def _same_value(expected: Any, actual: Any) -> bool:
+    if isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        try:
+            return float(actual) == float(expected)
+        except (TypeError, ValueError):
+            return False
+    if isinstance(expected, str) and isinstance(actual, str):
+        return expected.strip().casefold() == actual.strip().casefold()
+    return expected == actual
+
+
+def score(item: dict[str, Any], planner_output: Any) -> dict[str, Any]:
+    """Compara o plano gerado com o esperado, campo a campo no request_body."""
+    output = planner_output if isinstance(planner_output, dict) else {}
+    body = output.get("request_body") if isinstance(output.get("request_body"), dict) else {}
+    expected_body = {key: value for key, value in item["request_body"].items() if key != "telefone"}
+    matched = [key for key, value in expected_body.items() if _same_value(value, body.get(key))]
+    api_method = output.get("api_method")
+    return {
+        "operation_ok": output.get("operation", "none") == item["operation"],
+        "api_method_ok": (api_method in (None, "null")) if item["api_method"] is None else api_method == item["api_method"],
+        "body_fields": len(expected_body),
+        "body_matched": len(matched),
+        "body_mismatched": sorted(set(expected_body) - set(matched)),
+    }
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    """Percentil pelo método nearest-rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[index], 2)
+
+
+def evaluate(planner: Any, items: list[dict[str, Any]], parallelism: int) -> dict[str, Any]:
+    """Roda o planner sobre o corpus e agrega o resultado por intenção esperada."""
+
+    def run(index_item: tuple[int, dict[str, Any]]) -> dict[str, Any]:
+        index, item = index_item
+        started_at = time.perf_counter()
+        output = planner.plan(item["message"], item["telefone"], use_cache=False, usage_key=f"eval:{index}")
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        usage = (planner.usage.phone_snapshot(f"eval:{index}") or {}).get("total", {})
+        return {"item": item, "output": output, "latency_ms": latency_ms, "usage": usage, **score(item, output)}
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        results = list(executor.map(run, enumerate(items)))
+
+    by_intent: dict[str, list[dict[str, Any]]] = {}
+    for result in results:
+        by_intent.setdefault(result["item"]["operation"], []).append(result)
+    by_intent["_all"] = results
+
+    report: dict[str, Any] = {"items": len(results), "intents": {}, "failures": []}
+    if hasattr(planner, "planner_routing"):
+        # Caminho de cada plano no planner em duas etapas (local, estreito ou completo).
+        report["planner_routing"] = planner.planner_routing.stats()
+    for intent, group in sorted(by_intent.items()):
+        count = len(group)
+        body_fields = sum(result["body_fields"] for result in group)
+        report["intents"][intent] = {
+            "count": count,
+            "operation_accuracy": round(sum(result["operation_ok"] for result in group) / count, 4),
+            "api_method_accuracy": round(sum(result["api_method_ok"] for result in group) / count, 4),
+            "body_field_accuracy": round(sum(result["body_matched"] for result in group) / body_fields, 4)
+            if body_fields
+            else 1.0,
+            "exact_match": round(
+                sum(
+                    result["operation_ok"] and result["api_method_ok"] and not result["body_mismatched"]
+                    for result in group
+                )
+                / count,
+                4,
+            ),
+            "latency_p50_ms": _percentile([result["latency_ms"] for result in group], 50),
+            "latency_p95_ms": _percentile([result["latency_ms"] for result in group], 95),
+            "latency_p99_ms": _percentile([result["latency_ms"] for result in group], 99),
+            "prompt_tokens_avg": round(sum(result["usage"].get("prompt_tokens", 0) for result in group) / count, 1),
+            "cached_tokens_avg": round(sum(result["usage"].get("cached_tokens", 0) for result in group) / count, 1),
+            "completion_tokens_avg": round(
+                sum(result["usage"].get("completion_tokens", 0) for result in group) / count, 1
+            ),
+        }
+
+    for result in results:
+        if not (result["operation_ok"] and result["api_method_ok"] and not result["body_mismatched"]):
+            report["failures"].append(
+                {
+                    "message": result["item"]["message"],
+                    "expected": result["item"]["operation"],
+                    "got": result["output"],
+                    "body_mismatched": result["body_mismatched"],
+                }
+            )
+    return report
+
+
+def diff_against_baseline(report: dict[str, Any], baseline: dict[str, Any]) -> dict[str, Any]:
+    """Diferença (atual - baseline) das métricas principais de cada intenção."""
+    diff: dict[str, Any] = {}
+    for intent, metrics in report["intents"].items():
+        previous = baseline.get("intents", {}).get(intent)
+        if previous is None:
+            diff[intent] = "nova intenção"
+            continue
+        diff[intent] = {
+            metric: round(metrics[metric] - previous.get(metric, 0), 4) for metric in _DIFF_METRICS
+        }
+    return diff
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    header = f"{'intenção':<16}{'n':>5}{'op':>8}{'método':>8}{'campos':>8}{'exato':>8}{'p50ms':>10}{'p95ms':>10}{'tokens':>9}"
+    print(header)
+    print("-" * len(header))
+    for intent, metrics in report["intents"].items():
+        print(
+            f"{intent:<16}{metrics['count']:>5}{metrics['operation_accuracy']:>8.2f}"
+            f"{metrics['api_method_accuracy']:>8.2f}{metrics['body_field_accuracy']:>8.2f}"
+            f"{metrics['exact_match']:>8.2f}{metrics['latency_p50_ms']:>10.1f}"
+            f"{metrics['latency_p95_ms']:>10.1f}{metrics['prompt_tokens_avg']:>9.0f}"
+        )
+    print(f"\nFalhas: {len(report['failures'])}")
+    for failure in report["failures"][:20]:
+        print(f"- {failure['message']!r}: esperado {failure['expected']}, obtido {failure['got']}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Avaliação offline do planner sobre um corpus JSONL.")
+    parser.add_argument("corpus", help="Arquivo JSONL com message, telefone e o plano esperado.")
+    parser.add_argument("--parallel", type=int, default=4, help="Chamadas simultâneas ao planner.")
+    parser.add_argument("--stub", action="store_true", help="Usa o planner local por regras em vez do modelo.")
+    parser.add_argument("--baseline", help="Relatório salvo para comparar.")
+    parser.add_argument("--save-baseline", help="Salva o relatório atual como baseline neste caminho.")
+    parser.add_argument("--output", help="Grava o relatório completo em JSON neste caminho.")
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        planner: Any = StubPlanner()
+    else:
+        from api_test.agents import AgriculturalMultiAgentService
+
+        planner = AgriculturalMultiAgentService()
+        if planner.client is None:
+            print("OPENAI_API_KEY não configurada. Use --stub para rodar sem o modelo.")
+            return 1
+
+    items = list(read_corpus(args.corpus))
+    # Uma chave de consumo por item: o tracker precisa comportar o corpus inteiro.
+    planner.usage = UsageTracker(max_phones=max(len(items), 1))
+    report = evaluate(planner, items, max(1, args.parallel))
+    _print_report(report)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            report["baseline_diff"] = diff_against_baseline(report, json.load(baseline_file))
+        print("\nDiferença contra o baseline:")
+        print(json.dumps(report["baseline_diff"], ensure_ascii=False, indent=2))
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Este arquivo implementa o filtro local que roda antes do planner.
+A ideia é reconhecer, sem chamar a IA, mensagens curtas de conversa
+(saudações, agradecimentos, despedidas, confirmações e figurinhas/emojis)
+e responder com uma mensagem pronta, economizando as três chamadas de LLM.
+O filtro é conservador: só responde quando a mensagem inteira é conversa.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import unicodedata
+from typing import Any
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+_SPACES_RE = re.compile(r"\s+")
+
+# Cada padrão precisa casar com a mensagem inteira (já normalizada).
+_PATTERNS: tuple[tuple[str, re.Pattern[str]], ...] = (
+    (
+        "greeting",
+        re.compile(
+            r"^(?:(?:oi+e?|ola+|opa|eai|e ai|salve|hey|hello|hi|bom dia|boa tarde|boa noite)\s*)+"
+            r"(?:(?:tudo bem|tudo bom|tudo certo|como vai|blz|beleza)\s*)*$"
+        ),
+    ),
+    (
+        "thanks",
+        re.compile(
+            r"^(?:(?:muito )?(?:obrigad[oa]|brigad[oa]|obg|valeu|vlw|agradeco)\s*)+"
+            r"(?:(?:mesmo|demais|pela ajuda|viu|amigo)\s*)*$"
+        ),
+    ),
+    ("goodbye", re.compile(r"^(?:(?:tchau|ate mais|ate logo|ate amanha|falou|flw|bye)\s*)+$")),
+    ("ack", re.compile(r"^(?:(?:ok|okay|blz|beleza|certo|entendi|show|top|perfeito|massa|sim|ta bom)\s*)+$")),
+)
+
+GATE_REPLIES: dict[str, str] = {
+    "greeting": (
+        "Olá! 👋 Sou o assistente agrícola do ProRAF.\n\n"
+        "Posso te ajudar a:\n"
+        "🌾 Cadastrar produtos (ex: \"cadastrar laranja pera\")\n"
+        "📦 Registrar lotes (ex: \"colhi 30 kg de tomate no talhão B\")\n"
+        "📋 Listar seus produtos (ex: \"listar meus produtos\")\n\n"
+        "O que você quer fazer?"
+    ),
+    "thanks": "De nada! 😊 Se precisar cadastrar outro produto ou lote, é só mandar mensagem. 🚜",
+    "goodbye": "Até mais! 👋 Quando precisar, é só chamar. 🌱",
+    "ack": "Combinado! 👍 Se quiser cadastrar um produto, registrar um lote ou listar seus produtos, é só me dizer.",
+    "empty": (
+        "Recebi! 👍\n\n"
+        "Para cadastrar produtos, registrar lotes ou consultar seu catálogo, me diga por texto "
+        "o que deseja, por exemplo: \"listar meus produtos\"."
+    ),
+}
+
+
+def normalize(message: str) -> str:
+    """Minúsculas sem acentos nem pontuação; usado também pelo planner e pelo cache de respostas."""
+    text = unicodedata.normalize("NFKD", message.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _NON_WORD_RE.sub(" ", text)
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def classify_small_talk(message: str) -> str | None:
+    """Categoria da mensagem se ela for só conversa, ou None se deve seguir para o planner."""
+    text = normalize(message or "")
+    if not text:
+        # Só emojis, figurinhas ou pontuação.
+        return "empty"
+    if len(text) > 60:
+        return None
+    for category, pattern in _PATTERNS:
+        if pattern.match(text):
+            return category
+    return None
+
+
+class MessageGate:
+    """Aplica o filtro, registra cada decisão no log e mantém contadores por categoria."""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.counts: dict[str, int] = {"passed": 0}
+        self._lock = threading.Lock()
+
+    def check(self, message: str, telefone: str | None = None, in_conversation: bool = False) -> str | None:
+        """
+        Categoria da mensagem barrada, ou None se ela deve seguir para o planner.
+        Com `in_conversation` (há turnos recentes na memória), confirmações como
+        "sim" ou "ok" podem responder a uma proposta do bot e seguem para o planner.
+        """
+        if not self.enabled:
+            return None
+
+        category = classify_small_talk(message)
+        if category == "ack" and in_conversation:
+            category = None
+        with self._lock:
+            key = category or "passed"
+            self.counts[key] = self.counts.get(key, 0) + 1
+        if category is not None:
+            # Uma linha JSON por mensagem barrada, para medir a precisão do filtro depois.
+            print("[GATE] " + json.dumps({"categoria": category, "telefone": telefone, "mensagem": message[:200]}, ensure_ascii=False))
+        return category
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, **self.counts}
@@ -0,0 +1,193 @@
+"""
+Este arquivo implementa o health check em duas rotas: liveness e readiness.
+A ideia é que o balanceador nunca dispare chamadas ao ProRAF ou à OpenAI:
+uma tarefa em segundo plano testa as dependências em intervalo fixo e monta
+um snapshot já serializado, e as rotas só devolvem esse snapshot. Cada
+dependência (upstream) guarda as latências recentes do tráfego real e um
+circuit breaker simples, que corta as chamadas depois de falhas seguidas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+class Upstream:
+    """
+    Latências recentes e circuit breaker de uma dependência externa.
+
+    O circuito abre após `failure_threshold` falhas seguidas e recusa chamadas
+    por `reset_seconds`; depois disso libera uma chamada de teste por período
+    (meio-aberto) e fecha na primeira que der certo.
+    """
+
+    def __init__(self, name: str, window: int, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_at = 0.0
+        self.counts = {"calls": 0, "errors": 0, "short_circuited": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """False quando o circuito está aberto: a chamada deve falhar sem ir à rede."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_seconds or now - self._trial_at < self.reset_seconds:
+                self.counts["short_circuited"] += 1
+                return False
+            self._trial_at = now
+            return True
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        with self._lock:
+            self._latencies.append(elapsed_ms)
+            self.counts["calls"] += 1
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self.counts["errors"] += 1
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.counts["opened"] += 1
+                    print(f"[HEALTH] Circuito aberto para {self.name} após {self._failures} falhas seguidas.")
+                self._opened_at = time.monotonic()
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self._opened_at < self.reset_seconds else "half_open"
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            failures = self._failures
+            counts = dict(self.counts)
+
+        def percentile(fraction: float) -> float | None:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 2)
+
+        return {
+            "circuit": self.state(),
+            "consecutive_failures": failures,
+            "latency_ms": {
+                "samples": len(latencies),
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+            **counts,
+        }
+
+
+class HealthMonitor:
+    """
+    Tarefa em segundo plano que testa as dependências a cada `interval_seconds`
+    e guarda o corpo pronto de `/health/ready`. Um snapshot mais velho que
+    `stale_after_seconds` (tarefa travada ou morta) conta como não pronto.
+    """
+
+    def __init__(
+        self,
+        upstreams: dict[str, Upstream],
+        probes: dict[str, Callable[[], bool]],
+        interval_seconds: float,
+        stale_after_seconds: float,
+    ) -> None:
+        self.upstreams = upstreams
+        self.probes = probes
+        self.interval_seconds = interval_seconds
+        self.stale_after_seconds = stale_after_seconds
+        self._task: asyncio.Task | None = None
+        self._started_at = time.time()
+        self._refreshed_at: float | None = None
+        self._ready = False
+        self._body = self._render({"status": "starting", "ready": False, "checks": {}})
+        self.snapshot: dict[str, Any] = {}
+
+    @staticmethod
+    def _render(payload: dict[str, Any]) -> bytes:
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                print(f"[HEALTH] Erro ao atualizar o snapshot de saúde: {exc}")
+            await asyncio.sleep(self.interval_seconds)
+
+    @staticmethod
+    def _probe(probe: Callable[[], bool]) -> dict[str, Any]:
+        started_at = time.perf_counter()
+        try:
+            ok, error = bool(probe()), None
+        except Exception as exc:
+            ok, error = False, f"{type(exc).__name__}: {exc}"
+        return {
+            "ok": ok,
+            "error": error,
+            "elapsed_ms": round((time.perf_counter() - started_at) * 1000, 2),
+            "at": time.time(),
+        }
+
+    async def run_once(self) -> bool:
+        names = list(self.probes)
+        results = await asyncio.gather(*(asyncio.to_thread(self._probe, self.probes[name]) for name in names))
+
+        checks: dict[str, Any] = {}
+        for name, probe in zip(names, results):
+            upstream = self.upstreams.get(name)
+            check = {"last_probe": probe, **(upstream.snapshot() if upstream is not None else {})}
+            check["ok"] = probe["ok"] and check.get("circuit", "closed") == "closed"
+            checks[name] = check
+
+        ready = all(check["ok"] for check in checks.values())
+        self.snapshot = {
+            "status": "ready" if ready else "unavailable",
+            "ready": ready,
+            "checked_at": time.time(),
+            "interval_seconds": self.interval_seconds,
+            "checks": checks,
+        }
+        self._body = self._render(self.snapshot)
+        self._ready = ready
+        self._refreshed_at = time.monotonic()
+        return ready
+
+    def live(self) -> dict[str, Any]:
+        """Processo e event loop respondendo; não olha as dependências."""
+        return {"status": "ok", "uptime_seconds": round(time.time() - self._started_at, 1)}
+
+    def ready(self) -> tuple[int, bytes]:
+        """Status HTTP e corpo JSON do último snapshot, sem nenhuma chamada externa."""
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at > self.stale_after_seconds:
+            return 503, self._render({"status": "stale", "ready": False, "snapshot": self.snapshot})
+        return (200 if self._ready else 503), self._body
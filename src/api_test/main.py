@@ -4,22 +4,197 @@ A ideia geral é expor rotas HTTP simples e uma rota de conversa
 que usa multiagentes de IA para estruturar dados de produto/lote agrícola.
 """
 
+import asyncio
+import json
+import time
+
+_IMPORT_STARTED_AT = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from typing import Any
 
-from fastapi import Body, FastAPI
-from api_test.agents import AgriculturalMultiAgentService
-from api_test.schemas import MessageInput, SimpleInput, TelefoneInput
-from api_test.api_proraf import ProrafAPI
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from api_test.admission import AdmissionController, AdmissionRejected
+from api_test.health import HealthMonitor, Upstream
+from api_test.phone import normalize_phone
+from api_test.profiling import SamplingProfiler
+from api_test.scheduler import FairScheduler
+from api_test.schemas import MessageInput, SimpleInput, TelefoneInput, WebSocketMessageInput
 from api_test.settings import settings
+from api_test.tracing import NOOP_SPAN, Tracer
+
+try:
+    # orjson é opcional: quando instalado, serializa as respostas do chatbot mais rápido.
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:  # pragma: no cover - depende do ambiente
+    FastJSONResponse = JSONResponse
 
 api_tags = [
     {"name": "Health", "description": "Verificação básica de disponibilidade da API."},
     {"name": "WhatsApp", "description": "Integração de verificação de telefone com backend ProRAF."},
     {"name": "Chatbot", "description": "Rotas de conversa com IA para operações agrícolas."},
     {"name": "Utilitários", "description": "Rotas auxiliares de teste."},
+    {"name": "Admin", "description": "Rotas administrativas (exigem o header X-Admin-Token)."},
 ]
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Constrói os serviços fora do caminho de import e, opcionalmente,
+    aquece as conexões com OpenAI e ProRAF antes de aceitar requisições.
+    """
+    # Imports pesados (openai, requests) ficam fora do import de main.py.
+    from api_test.agents import AgriculturalMultiAgentService
+    from api_test.api_proraf import ProrafAPI
+    from api_test.cache import NullCache, build_cache
+    from api_test.mirror import CatalogMirror, MirrorSync
+    from api_test.outbox import Outbox, OutboxFlusher
+    from api_test.warmup import CatalogWarmer
+
+    cache = build_cache()
+    upstreams = {
+        name: Upstream(
+            name,
+            window=settings.health_latency_window,
+            failure_threshold=settings.circuit_failure_threshold,
+            reset_seconds=settings.circuit_reset_seconds,
+        )
+        for name in ("proraf", "openai")
+    }
+    proraf_client = ProrafAPI(
+        base_url=settings.proraf_api_base_url,
+        secret_key=settings.proraf_secret_key,
+        api_key=settings.proraf_api_key,
+        cache=cache,
+        upstream=upstreams["proraf"],
+    )
+    app.state.cache = cache
+    app.state.tracer = Tracer(
+        path=settings.tracing_path,
+        enabled=settings.tracing_enabled,
+        sample_rate=settings.tracing_sample_rate,
+        slow_threshold_ms=settings.tracing_slow_threshold_ms,
+        max_bytes=settings.tracing_max_bytes,
+    )
+    app.state.profiler = SamplingProfiler(
+        directory=settings.profiling_dir,
+        sample_rate=settings.profiling_sample_rate,
+        slow_threshold_ms=settings.profiling_slow_threshold_ms,
+        interval_ms=settings.profiling_interval_ms,
+        max_files=settings.profiling_max_files,
+    )
+    app.state.admission = AdmissionController(
+        limits={
+            "chatbot": settings.admission_chatbot_max_inflight,
+            "phone": settings.admission_phone_max_inflight,
+        },
+        retry_after=settings.admission_retry_after_seconds,
+    )
+    # Fila justa por telefone na frente da lane do chatbot (mesmo limite de vagas).
+    app.state.scheduler = FairScheduler(
+        max_inflight=settings.admission_chatbot_max_inflight,
+        phone_max_inflight=settings.scheduler_phone_max_inflight,
+        phone_max_queued=settings.scheduler_phone_max_queued,
+        max_queued=settings.scheduler_max_queued,
+        retry_after=settings.admission_retry_after_seconds,
+    )
+    app.state.proraf_client = proraf_client
+    outbox = None
+    if settings.outbox_enabled:
+        outbox = Outbox(settings.outbox_sqlite_path, max_attempts=settings.outbox_max_attempts)
+    app.state.outbox = outbox
+    mirror = CatalogMirror() if settings.catalog_mirror_enabled else None
+    app.state.multi_agent_service = AgriculturalMultiAgentService(
+        proraf=proraf_client,
+        cache=cache,
+        outbox=outbox,
+        mirror=mirror,
+        openai_upstream=upstreams["openai"],
+    )
+
+    built_at = time.perf_counter()
+    warmup: dict[str, bool] = {}
+    if settings.warmup_on_startup:
+        warmup = await asyncio.to_thread(app.state.multi_agent_service.warm_up)
+    ready_at = time.perf_counter()
+
+    app.state.startup_metrics = {
+        "import_to_build_ms": round((built_at - _IMPORT_STARTED_AT) * 1000, 2),
+        "warmup_ms": round((ready_at - built_at) * 1000, 2),
+        "import_to_ready_ms": round((ready_at - _IMPORT_STARTED_AT) * 1000, 2),
+        "warmup": warmup,
+        "first_request_ms": {},
+    }
+    print(f"[STARTUP] Pronto em {app.state.startup_metrics['import_to_ready_ms']} ms (warm-up: {warmup})")
+
+    app.state.catalog_warmer = None
+    if settings.catalog_warmup_enabled:
+        if isinstance(cache, NullCache):
+            print("[WARMUP] Aquecimento de catálogos ignorado: CACHE_BACKEND=none.")
+        else:
+            app.state.catalog_warmer = CatalogWarmer(
+                proraf=proraf_client,
+                activity=app.state.multi_agent_service.activity,
+                interval_seconds=settings.catalog_warmup_interval_seconds,
+                active_window_seconds=settings.catalog_warmup_active_window_seconds,
+                max_concurrency=settings.catalog_warmup_concurrency,
+                max_calls_per_second=settings.catalog_warmup_max_calls_per_second,
+                ttl_seconds=settings.catalog_warmup_ttl_seconds
+                or min(settings.cache_ttl_seconds, settings.catalog_warmup_interval_seconds),
+            )
+            app.state.catalog_warmer.start()
+
+    app.state.mirror_sync = None
+    if mirror is not None:
+        app.state.mirror_sync = MirrorSync(
+            proraf=proraf_client,
+            mirror=mirror,
+            interval_seconds=settings.catalog_mirror_interval_seconds,
+            batch_size=settings.catalog_mirror_batch_size,
+            max_concurrency=settings.catalog_mirror_concurrency,
+        )
+        app.state.mirror_sync.start()
+
+    # Sem chave da OpenAI o chatbot não chama o modelo: a readiness só depende do ProRAF.
+    service = app.state.multi_agent_service
+    probes = {"proraf": lambda: proraf_client.ping(timeout=settings.health_probe_timeout_seconds)}
+    if service.client is not None:
+        probes["openai"] = lambda: service.ping_openai(timeout=settings.health_probe_timeout_seconds)
+    app.state.health = HealthMonitor(
+        upstreams=upstreams,
+        probes=probes,
+        interval_seconds=settings.health_probe_interval_seconds,
+        stale_after_seconds=3 * settings.health_probe_interval_seconds + settings.health_probe_timeout_seconds,
+    )
+    app.state.health.start()
+
+    app.state.outbox_flusher = None
+    if outbox is not None:
+        app.state.outbox_flusher = OutboxFlusher(
+            outbox=outbox,
+            send=app.state.multi_agent_service.send_queued,
+            max_concurrency=settings.outbox_max_concurrency,
+            poll_interval_seconds=settings.outbox_poll_interval_seconds,
+            claim_timeout_seconds=settings.outbox_claim_timeout_seconds,
+        )
+        app.state.outbox_flusher.start()
+
+    yield
+
+    await app.state.health.stop()
+    if app.state.outbox_flusher is not None:
+        await app.state.outbox_flusher.stop()
+    if app.state.mirror_sync is not None:
+        await app.state.mirror_sync.stop()
+    if app.state.catalog_warmer is not None:
+        await app.state.catalog_warmer.stop()
+    app.state.admission.shutdown()
+
+
 app = FastAPI(
     title="API Test - Agentes Agrícolas",
     description=(
@@ -28,16 +203,76 @@ app = FastAPI(
     ),
     version="0.1.0",
     openapi_tags=api_tags,
+    lifespan=lifespan,
 )
 
-multi_agent_service = AgriculturalMultiAgentService()
-proraf_client = ProrafAPI(
-    base_url=settings.proraf_api_base_url,
-    secret_key=settings.proraf_secret_key,
-    api_key=settings.proraf_api_key,
-)
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected) -> JSONResponse:
+    """Recusa rápida quando a lane está cheia, indicando quando tentar de novo."""
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc), "lane": exc.lane},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+# Limite de rotas distintas registradas na métrica de primeira requisição.
+_FIRST_REQUEST_MAX_PATHS = 32
+
+
+@app.middleware("http")
+async def first_request_latency(request: Request, call_next):
+    """Mede a latência da primeira requisição de cada rota após o startup."""
+    first_request_ms = request.app.state.startup_metrics["first_request_ms"]
+    path = request.url.path
+    if path in first_request_ms or len(first_request_ms) >= _FIRST_REQUEST_MAX_PATHS:
+        return await call_next(request)
+
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    elapsed_ms = round((time.perf_counter() - started_at) * 1000, 2)
+    if first_request_ms.setdefault(path, elapsed_ms) == elapsed_ms:
+        print(f"[STARTUP] Primeira requisição em {path}: {elapsed_ms} ms")
+    return response
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Abre o span raiz da requisição; os spans internos se penduram nele via contextvars.
+    O trace só fecha quando o corpo termina de ser enviado, para incluir os spans
+    gerados durante respostas em streaming (importação e exportação em massa).
+    """
+    tracer = request.app.state.tracer
+    root = tracer.open(f"{request.method} {request.url.path}")
+    try:
+        with tracer.activate(root):
+            response = await call_next(request)
+    except BaseException:
+        tracer.close(root)
+        raise
+    root.set(status_code=response.status_code)
+    if response.status_code >= 500:
+        root.fail(f"HTTP {response.status_code}")
+    if root is NOOP_SPAN:
+        return response
+
+    body = response.body_iterator
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        except BaseException as exc:
+            root.fail(f"{type(exc).__name__}: {exc}")
+            raise
+        finally:
+            tracer.close(root)
+
+    response.body_iterator = traced_body()
+    return response
+
 
-    
 @app.get(
     "/",
     tags=["Health"],
@@ -49,6 +284,240 @@ async def root():
     return {"message": "Hello World"}
 
 
+@app.get(
+    "/health/live",
+    tags=["Health"],
+    summary="Liveness",
+    description="Indica que o processo está respondendo. Não consulta nenhuma dependência.",
+)
+async def health_live(request: Request) -> dict[str, Any]:
+    """Liveness para o orquestrador: reinicia o processo se parar de responder."""
+    return request.app.state.health.live()
+
+
+@app.get(
+    "/health/ready",
+    tags=["Health"],
+    summary="Readiness",
+    description=(
+        "Estado de ProRAF e OpenAI segundo a última verificação em segundo plano, com "
+        "percentis de latência recentes e estado do circuit breaker de cada um. Responde 503 "
+        "quando alguma dependência falhou, está com o circuito aberto ou o snapshot está velho."
+    ),
+)
+async def health_ready(request: Request) -> Response:
+    """Devolve o snapshot já serializado: nenhuma chamada externa por requisição."""
+    status_code, body = request.app.state.health.ready()
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+@app.get(
+    "/startup",
+    tags=["Health"],
+    summary="Métricas de inicialização",
+    description=(
+        "Retorna o tempo entre o import da aplicação e o estado pronto, o resultado "
+        "do warm-up das conexões e a latência da primeira requisição de cada rota."
+    ),
+)
+async def startup_metrics(request: Request) -> dict[str, Any]:
+    """Expõe as métricas de cold start coletadas no lifespan."""
+    return request.app.state.startup_metrics
+
+
+@app.get(
+    "/stats",
+    tags=["Health"],
+    summary="Métricas internas",
+    description="Retorna contadores internos da aplicação, como a taxa de acerto do cache.",
+)
+async def stats(request: Request) -> dict[str, Any]:
+    """Agrega as métricas dos componentes internos."""
+    return {
+        "cache": request.app.state.cache.stats(),
+        "proraf_conditional": request.app.state.proraf_client.conditional_stats,
+        "admission": request.app.state.admission.stats(),
+        "scheduler": request.app.state.scheduler.stats(),
+        "profiling": request.app.state.profiler.stats(),
+        "tracing": request.app.state.tracer.stats(),
+        "prefetch": request.app.state.multi_agent_service.prefetch_stats.snapshot(),
+        "memory": request.app.state.multi_agent_service.memory.stats(),
+        "gate": request.app.state.multi_agent_service.gate.stats(),
+        "reply_cache": request.app.state.multi_agent_service.reply_cache_stats,
+        "catalog_warmup": warmer.stats if (warmer := request.app.state.catalog_warmer) else None,
+        "outbox": outbox.stats() if (outbox := request.app.state.outbox) else None,
+        "catalog_mirror": (
+            {**service.mirror.stats(), "sync": request.app.state.mirror_sync.stats}
+            if (service := request.app.state.multi_agent_service).mirror
+            else None
+        ),
+    }
+
+
+@app.get(
+    "/usage",
+    tags=["Health"],
+    summary="Consumo de tokens da OpenAI",
+    description=(
+        "Tokens de prompt, tokens servidos pelo prompt caching e tokens de resposta, "
+        "agregados globalmente e por etapa/modelo."
+    ),
+)
+async def usage(request: Request) -> dict[str, Any]:
+    """Retorna o consumo global de tokens do processo."""
+    service = request.app.state.multi_agent_service
+    return {**service.usage.snapshot(), "planner_routing": service.planner_routing.stats()}
+
+
+@app.get(
+    "/usage/{telefone}",
+    tags=["Health"],
+    summary="Consumo de tokens por telefone",
+    description="Consumo de tokens das conversas de um telefone, por etapa/modelo.",
+)
+async def usage_por_telefone(request: Request, telefone: str) -> dict[str, Any]:
+    """Retorna o consumo de tokens de um telefone (normalizado)."""
+    telefone = normalize_phone(telefone)
+    data = request.app.state.multi_agent_service.usage.phone_snapshot(telefone)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Nenhum consumo registrado para este telefone.")
+    return {"telefone": telefone, "usage": data}
+
+
+def require_admin(x_admin_token: str = Header(default="")) -> None:
+    """Rotas administrativas só respondem com ADMIN_TOKEN configurado e enviado no header."""
+    if not settings.admin_token or x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Acesso administrativo negado.")
+
+
+def _get_outbox(request: Request) -> Any:
+    outbox = request.app.state.outbox
+    if outbox is None:
+        raise HTTPException(status_code=404, detail="Outbox desativada (OUTBOX_ENABLED=false).")
+    return outbox
+
+
+@app.get(
+    "/outbox",
+    tags=["Admin"],
+    summary="Lista escritas enfileiradas",
+    description="Escritas da outbox (mais recentes primeiro), filtradas por telefone e/ou status.",
+    dependencies=[Depends(require_admin)],
+)
+async def listar_outbox(
+    request: Request,
+    telefone: str | None = None,
+    status: str | None = None,
+    limit: int = 50,
+) -> dict[str, Any]:
+    """Lista as escritas da fila local."""
+    outbox = _get_outbox(request)
+    telefone = normalize_phone(telefone) if telefone else None
+    entries = await asyncio.to_thread(outbox.list, telefone, status, min(max(limit, 1), 500))
+    return {"entries": entries}
+
+
+@app.get(
+    "/outbox/{outbox_id}",
+    tags=["Admin"],
+    summary="Consulta uma escrita enfileirada",
+    description="Status de entrega de uma escrita: pending, sending, done, rejected ou failed.",
+    dependencies=[Depends(require_admin)],
+)
+async def consultar_outbox(request: Request, outbox_id: int) -> dict[str, Any]:
+    """Retorna uma escrita da outbox pelo protocolo."""
+    entry = await asyncio.to_thread(_get_outbox(request).get, outbox_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Protocolo não encontrado.")
+    return entry
+
+
+@app.get(
+    "/admin/profiles",
+    tags=["Admin"],
+    summary="Lista profiles de requisições",
+    description="Profiles amostrados (fração configurada ou requisições lentas), do mais recente ao mais antigo.",
+    dependencies=[Depends(require_admin)],
+)
+async def listar_profiles(request: Request) -> dict[str, Any]:
+    """Lista os arquivos do anel de profiles."""
+    return {"profiles": request.app.state.profiler.list_profiles()}
+
+
+@app.get(
+    "/admin/profiles/{name}",
+    tags=["Admin"],
+    summary="Baixa um profile",
+    description="Arquivo em formato collapsed stacks, para flamegraph.pl ou speedscope.",
+    dependencies=[Depends(require_admin)],
+)
+async def baixar_profile(request: Request, name: str) -> FileResponse:
+    """Devolve um profile do anel pelo nome."""
+    path = request.app.state.profiler.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile não encontrado.")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+
+@app.post(
+    "/admin/import/lotes",
+    tags=["Admin"],
+    summary="Importa lotes de colheita em massa",
+    description=(
+        "Recebe uma planilha CSV (com cabeçalho, separador `,` ou `;`) ou JSONL com colunas "
+        "telefone, produto, talhao, producao, unidade, dt_plantio e dt_colheita, e cria um lote "
+        "por linha direto no ProRAF, sem passar pela IA. Responde em NDJSON: uma linha por "
+        "registro importado (fora de ordem, com o número da `linha`) e um resumo no final."
+    ),
+    dependencies=[Depends(require_admin)],
+)
+async def importar_lotes(request: Request, formato: str | None = None) -> StreamingResponse:
+    """Importa a planilha em streaming, com concorrência limitada."""
+    from api_test.bulk import HarvestImporter, aiter_chunks, aiter_lines, aiter_rows, spool_body
+
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "jsonl"
+    if formato not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Formato deve ser csv ou jsonl.")
+
+    importer = HarvestImporter(request.app.state.proraf_client, settings.import_max_concurrency)
+    spool = await spool_body(request.stream())
+    rows = aiter_rows(aiter_lines(aiter_chunks(spool)), formato)
+
+    async def body():
+        try:
+            async for item in importer.run(rows):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        finally:
+            spool.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.get(
+    "/admin/export/produtos",
+    tags=["Admin"],
+    summary="Exporta o catálogo de todos os telefones",
+    description=(
+        "Percorre os telefones cadastrados no ProRAF e devolve os produtos de cada um em NDJSON "
+        "(`product`), com uma linha `cursor` ao terminar cada telefone. Para retomar uma "
+        "exportação interrompida, envie o último cursor recebido em `?cursor=`."
+    ),
+    dependencies=[Depends(require_admin)],
+)
+async def exportar_produtos(request: Request, cursor: str | None = None) -> StreamingResponse:
+    """Exporta os catálogos em streaming, com concorrência limitada e ordem estável."""
+    from api_test.bulk import CatalogExporter
+
+    exporter = CatalogExporter(request.app.state.proraf_client, settings.export_max_concurrency)
+
+    async def body():
+        async for item in exporter.run(cursor):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 @app.post(
     "/verificaTelefone",
     tags=["WhatsApp"],
@@ -59,6 +528,7 @@ async def root():
     ),
 )
 async def verifica_telefone(
+    request: Request,
     data: TelefoneInput = Body(
         ...,
         examples={
@@ -74,14 +544,10 @@ async def verifica_telefone(
     )
 ) -> dict[str, Any]:
     """Normaliza o telefone e consulta existência no backend ProRAF."""
-    # se a resposta vier 555596852212@s.whatsapp.net, extrai apenas o número
-    if data.telefone.endswith("@s.whatsapp.net"):
-        telefone1 = data.telefone.split("@")[0]
-        telefone = telefone1.strip()
-    else:
-        telefone = data.telefone.strip()
-
-    resultado = proraf_client.verificar_telefone(telefone)
+    telefone = normalize_phone(data.telefone)
+    resultado = await request.app.state.admission.lane("phone").run(
+        request.app.state.proraf_client.verificar_telefone, telefone
+    )
     return {
         "telefone": telefone,
         "resultado": resultado,
@@ -115,11 +581,14 @@ async def create_message(
     summary="Conversa com IA (rota principal)",
     description=(
         "Recebe mensagem do usuário e opcionalmente telefone para execução de "
-        "operações no ProRAF (produto/lote)."
+        "operações no ProRAF (produto/lote). O campo `profile` escolhe os campos "
+        "da resposta e evita gerar os que não forem pedidos."
     ),
+    response_class=FastJSONResponse,
 )
-@app.post("/chatbot", include_in_schema=False)
+@app.post("/chatbot", include_in_schema=False, response_class=FastJSONResponse)
 async def mensagem(
+    request: Request,
     data: MessageInput = Body(
         ...,
         examples={
@@ -137,14 +606,100 @@ async def mensagem(
                     "telefone": "55996852212",
                 },
             },
+            "somente_whatsapp": {
+                "summary": "Apenas a mensagem de WhatsApp",
+                "value": {
+                    "message": "listar meus produtos",
+                    "telefone": "55996852212@s.whatsapp.net",
+                    "profile": "whatsapp",
+                },
+            },
         },
     )
 ) -> dict[str, Any] | int:
     """Executa o fluxo IA -> planejamento -> CRUD -> resposta natural."""
     print("Received message:", data.message)
-    if data.telefone.endswith("@s.whatsapp.net"):
-        telefone1 = data.telefone.split("@")[0]
-        telefone = telefone1.strip()
-    else:
-        telefone = data.telefone.strip() 
-    return multi_agent_service.process_message(data.message, telefone)
\ No newline at end of file
+    telefone = normalize_phone(data.telefone) or None
+    # Espera a vez do telefone e roda fora do event loop, na lane do chatbot:
+    # health e verificaTelefone não esperam por ela.
+    result = await request.app.state.scheduler.run(
+        telefone,
+        request.app.state.admission.lane("chatbot").run,
+        request.app.state.profiler.wrap("mensagem", request.app.state.multi_agent_service.process_message),
+        data.message,
+        telefone,
+        profile=data.profile,
+    )
+    # Devolve a resposta direto, sem passar pelo jsonable_encoder do FastAPI.
+    return FastJSONResponse(content=result)
+
+@app.websocket("/ws/mensagem")
+async def mensagem_ws(websocket: WebSocket):
+    """
+    Canal persistente para o gateway do WhatsApp.
+
+    Cada mensagem enviada é um JSON com `id`, `message`, `telefone` e `profile`
+    (mesmos campos de `/mensagem`). As respostas chegam como `{"id", "result"}`
+    ou `{"id", "error"}` assim que cada uma fica pronta, fora de ordem.
+    Controle de fluxo: o servidor só lê a próxima mensagem quando há espaço na
+    janela de `WS_MAX_INFLIGHT` mensagens em processamento por conexão.
+    """
+    await websocket.accept()
+    app_state = websocket.app.state
+    window = asyncio.Semaphore(settings.ws_max_inflight)
+    send_lock = asyncio.Lock()
+    pending: set[asyncio.Task] = set()
+
+    async def reply(payload: dict[str, Any]) -> None:
+        try:
+            async with send_lock:
+                await websocket.send_text(json.dumps(payload, ensure_ascii=False))
+        except Exception as exc:
+            print(f"[WS] Falha ao enviar resposta {payload.get('id')}: {exc}")
+
+    async def handle(data: WebSocketMessageInput) -> None:
+        try:
+            telefone = normalize_phone(data.telefone) or None
+            with app_state.tracer.trace("WS /ws/mensagem", message_id=data.id):
+                result = await app_state.scheduler.run(
+                    telefone,
+                    app_state.admission.lane("chatbot").run,
+                    app_state.profiler.wrap("ws_mensagem", app_state.multi_agent_service.process_message),
+                    data.message,
+                    telefone,
+                    profile=data.profile,
+                )
+            await reply({"id": data.id, "result": result})
+        except AdmissionRejected as exc:
+            await reply({"id": data.id, "error": str(exc), "retry_after": exc.retry_after})
+        except Exception as exc:
+            await reply({"id": data.id, "error": f"Erro ao processar mensagem: {exc}"})
+        finally:
+            window.release()
+
+    await reply({"type": "ready", "window": settings.ws_max_inflight})
+    try:
+        while True:
+            await window.acquire()
+            try:
+                raw = await websocket.receive_text()
+            except KeyError:
+                # Frame binário: o Starlette não encontra a chave "text".
+                window.release()
+                await reply({"id": None, "error": "Mensagem inválida: envie JSON como texto, não binário."})
+                continue
+            try:
+                data = WebSocketMessageInput.model_validate_json(raw)
+            except ValidationError as exc:
+                window.release()
+                await reply({"id": None, "error": "Mensagem inválida.", "detail": exc.errors(include_url=False)})
+                continue
+
+            task = asyncio.create_task(handle(data))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,123 @@
+"""
+Este arquivo implementa a memória curta de conversa por telefone.
+A ideia é guardar as últimas interações em formato compacto, num buffer
+circular com teto de tokens, e injetar no planner apenas um resumo curto,
+para que mensagens como "e mais 10 kg" possam ser resolvidas sem que o
+prompt cresça sem limite.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any
+
+from api_test.usage import estimate_tokens
+
+# Campos do request_body que ajudam a resolver referências em mensagens seguintes.
+_CONTEXT_FIELDS = ("name", "product_id", "talhao", "producao", "unidadeMedida", "dt_plantio", "dt_colheita")
+
+# Tamanho máximo de cada mensagem do usuário guardada na memória.
+_MAX_MESSAGE_CHARS = 160
+
+
+class _PhoneMemory:
+    __slots__ = ("turns", "last_seen")
+
+    def __init__(self, max_turns: int) -> None:
+        self.turns: deque[str] = deque(maxlen=max_turns)
+        self.last_seen = time.monotonic()
+
+
+def compact_turn(user_message: str, planner_output: dict[str, Any]) -> str:
+    """Resume uma interação em uma linha: mensagem, operação e campos relevantes."""
+    message = " ".join(user_message.split())[:_MAX_MESSAGE_CHARS]
+    request_body = planner_output.get("request_body") or {}
+    fields = [
+        f"{field}={request_body[field]}"
+        for field in _CONTEXT_FIELDS
+        if isinstance(request_body, dict) and request_body.get(field) not in (None, "")
+    ]
+    operation = planner_output.get("operation", "none")
+    return f"usuario: {message} | operacao: {operation}" + (f" | {' '.join(fields)}" if fields else "")
+
+
+class ConversationMemory:
+    """Memória por telefone com buffer circular, teto de tokens e despejo por inatividade."""
+
+    def __init__(self, max_turns: int, max_tokens: int, idle_ttl_seconds: float, max_phones: int) -> None:
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_phones = max_phones
+        self._phones: OrderedDict[str, _PhoneMemory] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _evict(self) -> None:
+        deadline = time.monotonic() - self.idle_ttl_seconds
+        # O OrderedDict fica ordenado por último acesso: os ociosos estão no começo.
+        while self._phones:
+            phone, memory = next(iter(self._phones.items()))
+            if memory.last_seen >= deadline and len(self._phones) <= self.max_phones:
+                break
+            del self._phones[phone]
+            self.evicted += 1
+
+    def add_turn(self, telefone: str, user_message: str, planner_output: dict[str, Any]) -> None:
+        turn = compact_turn(user_message, planner_output)
+        with self._lock:
+            memory = self._phones.get(telefone)
+            if memory is None:
+                memory = self._phones[telefone] = _PhoneMemory(self.max_turns)
+            memory.turns.append(turn)
+            memory.last_seen = time.monotonic()
+            self._phones.move_to_end(telefone)
+            self._evict()
+
+    def summary(self, telefone: str) -> str | None:
+        """Últimas interações, da mais antiga para a mais recente, dentro do teto de tokens."""
+        with self._lock:
+            self._evict()
+            memory = self._phones.get(telefone)
+            turns = list(memory.turns) if memory is not None else []
+
+        selected: list[str] = []
+        budget = self.max_tokens
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn)
+            if cost > budget:
+                break
+            selected.append(turn)
+            budget -= cost
+        return "\n".join(reversed(selected)) or None
+
+    def has_turns(self, telefone: str) -> bool:
+        """Se o telefone tem interações recentes (ainda não despejadas por inatividade)."""
+        with self._lock:
+            self._evict()
+            memory = self._phones.get(telefone)
+            return memory is not None and bool(memory.turns)
+
+    def clear(self, telefone: str) -> None:
+        with self._lock:
+            self._phones.pop(telefone, None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            turns = sum(len(memory.turns) for memory in self._phones.values())
+            approx_bytes = sys.getsizeof(self._phones) + sum(
+                sys.getsizeof(phone)
+                + sys.getsizeof(memory)
+                + sys.getsizeof(memory.turns)
+                + sum(sys.getsizeof(turn) for turn in memory.turns)
+                for phone, memory in self._phones.items()
+            )
+            return {
+                "phones": len(self._phones),
+                "turns": turns,
+                "approx_bytes": approx_bytes,
+                "evicted": self.evicted,
+            }
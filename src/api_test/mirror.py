@@ -0,0 +1,264 @@
+"""
+Este arquivo implementa o espelho local dos catálogos de todos os produtores.
+A ideia é resolver `product_id` por nome sem ida ao ProRAF: cada telefone
+guarda só ids (array de inteiros) e nomes normalizados (strings internadas,
+compartilhadas entre telefones), o que cabe dezenas de milhares de catálogos
+em poucos MB. O espelho é preenchido por `listar_telefones` + uma leitura de
+catálogo que não passa pelo cache TTL, atualizado pelas nossas próprias escritas
+e revalidado aos poucos em segundo plano. Cada catálogo guarda o próprio
+ETag/Last-Modified: catálogo sem mudança volta como 304, sem download.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from array import array
+from typing import Any
+
+from api_test.api_proraf import ProrafAPI
+from api_test.phone import extract_phones, normalize_phone
+
+
+def _key(name: Any) -> str:
+    return sys.intern(str(name or "").strip().casefold())
+
+
+class _Catalog:
+    """
+    Catálogo compacto de um telefone: `names[i]` é o nome normalizado de `ids[i]`.
+    `etag`/`last_modified` são os validadores da última leitura no ProRAF.
+    """
+
+    __slots__ = ("ids", "names", "synced_at", "etag", "last_modified")
+
+    def __init__(
+        self,
+        ids: array,
+        names: tuple[str, ...],
+        synced_at: float,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        self.ids = ids
+        self.names = names
+        self.synced_at = synced_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def find(self, key: str) -> int | None:
+        try:
+            return self.ids[self.names.index(key)]
+        except ValueError:
+            return None
+
+
+class CatalogMirror:
+    """Espelho thread-safe dos catálogos, indexado por telefone normalizado."""
+
+    def __init__(self) -> None:
+        self._catalogs: dict[str, _Catalog] = {}
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "writes": 0}
+
+    def lookup(self, telefone: str, name: str) -> int | None:
+        """`product_id` pelo nome, ou None se o telefone ou o produto não estiverem no espelho."""
+        telefone = normalize_phone(telefone)
+        with self._lock:
+            catalog = self._catalogs.get(telefone)
+            product_id = catalog.find(_key(name)) if catalog is not None else None
+            self.counts["hits" if product_id is not None else "misses"] += 1
+        return product_id
+
+    def replace(
+        self,
+        telefone: str,
+        products: list[dict[str, Any]],
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        """Substitui o catálogo do telefone pelo retornado pelo ProRAF."""
+        ids = array("q")
+        names = []
+        for item in products:
+            if isinstance(item, dict) and item.get("id") is not None:
+                ids.append(int(item["id"]))
+                names.append(_key(item.get("name")))
+        catalog = _Catalog(ids, tuple(names), time.time(), etag, last_modified)
+        telefone = normalize_phone(telefone)
+        with self._lock:
+            self._catalogs[telefone] = catalog
+
+    def validators(self, telefone: str) -> tuple[str | None, str | None]:
+        """ETag e Last-Modified guardados para o catálogo do telefone."""
+        with self._lock:
+            catalog = self._catalogs.get(normalize_phone(telefone))
+            return (catalog.etag, catalog.last_modified) if catalog is not None else (None, None)
+
+    def touch(self, telefone: str) -> None:
+        """Marca o catálogo como revalidado (304: nada mudou)."""
+        with self._lock:
+            catalog = self._catalogs.get(normalize_phone(telefone))
+            if catalog is not None:
+                catalog.synced_at = time.time()
+
+    def contains(self, telefone: str) -> bool:
+        with self._lock:
+            return normalize_phone(telefone) in self._catalogs
+
+    def add(self, telefone: str, product_id: int, name: str) -> None:
+        """Write-through de um produto criado por nós (só se o telefone já estiver no espelho)."""
+        key = _key(name)
+        telefone = normalize_phone(telefone)
+        with self._lock:
+            catalog = self._catalogs.get(telefone)
+            if catalog is None or catalog.find(key) is not None:
+                return
+            catalog.ids.append(int(product_id))
+            catalog.names = catalog.names + (key,)
+            # O catálogo no ProRAF mudou: a próxima revalidação deve baixar de novo.
+            catalog.etag = catalog.last_modified = None
+            self.counts["writes"] += 1
+
+    def retain(self, phones: set[str]) -> None:
+        """Remove telefones que não estão mais cadastrados no ProRAF."""
+        with self._lock:
+            for telefone in [phone for phone in self._catalogs if phone not in phones]:
+                del self._catalogs[telefone]
+
+    def stalest(self, phones: list[str], limit: int) -> list[str]:
+        """Os `limit` telefones sincronizados há mais tempo (os nunca sincronizados primeiro)."""
+        with self._lock:
+            synced = {phone: catalog.synced_at for phone, catalog in self._catalogs.items()}
+        return sorted(phones, key=lambda phone: synced.get(phone, 0.0))[:limit]
+
+    def stats(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            catalogs = list(self._catalogs.items())
+            counts = dict(self.counts)
+
+        approx_bytes = sys.getsizeof(self._catalogs)
+        unique_names: set[str] = set()
+        products = 0
+        for telefone, catalog in catalogs:
+            approx_bytes += (
+                sys.getsizeof(telefone) + sys.getsizeof(catalog) + sys.getsizeof(catalog.ids) + sys.getsizeof(catalog.names)
+            )
+            unique_names.update(catalog.names)
+            products += len(catalog.ids)
+        # Nomes internados são contados uma vez só.
+        approx_bytes += sum(sys.getsizeof(name) for name in unique_names)
+
+        lags = [now - catalog.synced_at for _, catalog in catalogs]
+        return {
+            "phones": len(catalogs),
+            "products": products,
+            "unique_names": len(unique_names),
+            "approx_bytes": approx_bytes,
+            "max_lag_seconds": round(max(lags), 1) if lags else None,
+            "avg_lag_seconds": round(sum(lags) / len(lags), 1) if lags else None,
+            **counts,
+        }
+
+
+def _registered_phones(response: Any) -> list[str] | None:
+    """
+    Telefones de uma resposta bem-formada de `listar_telefones`, ou None para
+    erro, 304 sem corpo ou formato inesperado (que não podem esvaziar o espelho).
+    """
+    if isinstance(response, dict):
+        if "error" in response:
+            return None
+        response = response.get("telefones", response.get("phones"))
+    if not isinstance(response, list):
+        return None
+    return extract_phones(response)
+
+
+class MirrorSync:
+    """
+    Tarefa em segundo plano que mantém o espelho: a cada ciclo busca a lista
+    de telefones e revalida os `batch_size` catálogos mais antigos.
+    """
+
+    def __init__(
+        self,
+        proraf: ProrafAPI,
+        mirror: CatalogMirror,
+        interval_seconds: float,
+        batch_size: int,
+        max_concurrency: int,
+    ) -> None:
+        self.proraf = proraf
+        self.mirror = mirror
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._task: asyncio.Task | None = None
+        self.stats: dict[str, Any] = {
+            "runs": 0,
+            "refreshed": 0,
+            "not_modified": 0,
+            "errors": 0,
+            "last_run_at": None,
+            "last_run_ms": None,
+        }
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                print(f"[MIRROR] Erro ao sincronizar espelho de catálogos: {exc}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> int:
+        started_at = time.perf_counter()
+        response = await asyncio.to_thread(self.proraf.listar_telefones)
+        phones = _registered_phones(response)
+        if phones is None:
+            self.stats["errors"] += 1
+            error = response.get("error") if isinstance(response, dict) else None
+            raise RuntimeError(error or f"Resposta inesperada de listar_telefones: {type(response).__name__}")
+        self.mirror.retain(set(phones))
+        targets = self.mirror.stalest(phones, self.batch_size)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        def fetch(telefone: str) -> str:
+            # Fora do cache TTL e dos validadores do cliente: o espelho guarda os seus.
+            etag, last_modified = self.mirror.validators(telefone)
+            result = self.proraf.listar_produtos_sem_cache(telefone, etag, last_modified)
+            if result.get("not_modified"):
+                self.mirror.touch(telefone)
+                return "not_modified"
+            if "error" in result:
+                return "errors"
+            self.mirror.replace(telefone, result.get("products") or [], result.get("etag"), result.get("last_modified"))
+            return "refreshed"
+
+        async def refresh(telefone: str) -> str:
+            async with semaphore:
+                return await asyncio.to_thread(fetch, telefone)
+
+        results = await asyncio.gather(*(refresh(phone) for phone in targets))
+        for outcome in results:
+            self.stats[outcome] += 1
+        refreshed = results.count("refreshed") + results.count("not_modified")
+        self.stats["runs"] += 1
+        self.stats["last_run_at"] = time.time()
+        self.stats["last_run_ms"] = round((time.perf_counter() - started_at) * 1000, 2)
+        return refreshed
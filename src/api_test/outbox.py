@@ -0,0 +1,227 @@
+"""
+Este arquivo implementa a fila local (outbox) de escritas no ProRAF.
+A ideia é que, no modo outbox, `criar_lote` e `criar_produto` já validados
+sejam gravados numa fila SQLite e o usuário receba a confirmação na hora.
+Um flusher em segundo plano envia as escritas ao ProRAF com concorrência
+limitada, novas tentativas com backoff e ordem garantida por telefone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+# Operações que podem ser enfileiradas.
+OUTBOX_METHODS = frozenset({"criar_lote", "criar_produto"})
+
+PENDING = "pending"
+SENDING = "sending"
+DONE = "done"
+REJECTED = "rejected"
+FAILED = "failed"
+
+
+def is_transient(result: Any) -> bool:
+    """Erros de rede/timeout/5xx e circuito aberto valem nova tentativa; recusas do ProRAF (4xx) não."""
+    if not isinstance(result, dict) or "error" not in result:
+        return False
+    status_code = result.get("status_code")
+    if isinstance(status_code, int):
+        return status_code >= 500
+    error = str(result.get("error", "")).casefold()
+    return any(marker in error for marker in ("timeout", "conex", "connection", "circuito"))
+
+
+class Outbox:
+    """Fila persistente em SQLite (modo WAL), compartilhada pelos workers do host."""
+
+    def __init__(self, path: str, max_attempts: int = 8, base_backoff_seconds: float = 2) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " telefone TEXT NOT NULL,"
+            " api_method TEXT NOT NULL,"
+            " request_body TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " claimed_at REAL,"
+            " last_error TEXT,"
+            " result TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_phone_status ON outbox (telefone, status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, next_attempt_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row: sqlite3.Row | None) -> dict[str, Any] | None:
+        if row is None:
+            return None
+        data = dict(row)
+        data["request_body"] = json.loads(data["request_body"])
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        return data
+
+    def enqueue(self, telefone: str, api_method: str, request_body: dict[str, Any]) -> int:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO outbox (telefone, api_method, request_body, status, next_attempt_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (telefone, api_method, json.dumps(request_body, ensure_ascii=False), PENDING, now, now, now),
+        )
+        return int(cursor.lastrowid)
+
+    def get(self, entry_id: int) -> dict[str, Any] | None:
+        return self._row(self._conn().execute("SELECT * FROM outbox WHERE id = ?", (entry_id,)).fetchone())
+
+    def list(self, telefone: str | None = None, status: str | None = None, limit: int = 50) -> list[dict[str, Any]]:
+        query = "SELECT * FROM outbox WHERE 1 = 1"
+        params: list[Any] = []
+        if telefone:
+            query += " AND telefone = ?"
+            params.append(telefone)
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [self._row(row) for row in self._conn().execute(query, params).fetchall()]
+
+    def claim_heads(self, limit: int) -> list[dict[str, Any]]:
+        """
+        Reserva até `limit` escritas prontas, no máximo uma por telefone e sempre
+        a mais antiga ainda não concluída dele (garante a ordem por telefone).
+        """
+        now = time.time()
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT o.id FROM outbox o"
+            " WHERE o.status = ? AND o.next_attempt_at <= ?"
+            " AND o.id = (SELECT MIN(h.id) FROM outbox h WHERE h.telefone = o.telefone AND h.status IN (?, ?))"
+            " ORDER BY o.id LIMIT ?",
+            (PENDING, now, PENDING, SENDING, limit),
+        ).fetchall()
+
+        claimed = []
+        for row in rows:
+            # O UPDATE condicional é atômico: só um worker consegue reservar cada escrita.
+            cursor = conn.execute(
+                "UPDATE outbox SET status = ?, claimed_at = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (SENDING, now, now, row["id"], PENDING),
+            )
+            if cursor.rowcount == 1:
+                claimed.append(self.get(row["id"]))
+        return claimed
+
+    def complete(self, entry_id: int, result: Any) -> None:
+        status = DONE if isinstance(result, dict) and "error" not in result else REJECTED
+        self._conn().execute(
+            "UPDATE outbox SET status = ?, result = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False, default=str), time.time(), entry_id),
+        )
+
+    def retry_later(self, entry_id: int, attempts: int, error: str) -> None:
+        attempts += 1
+        now = time.time()
+        if attempts >= self.max_attempts:
+            self._conn().execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (FAILED, attempts, error, now, entry_id),
+            )
+            return
+        backoff = self.base_backoff_seconds * 2 ** (attempts - 1)
+        self._conn().execute(
+            "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ?"
+            " WHERE id = ?",
+            (PENDING, attempts, error, now + backoff, now, entry_id),
+        )
+
+    def reclaim_stale(self, timeout_seconds: float) -> None:
+        """Devolve para a fila escritas reservadas por um worker que morreu no meio do envio."""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE outbox SET status = ?, updated_at = ? WHERE status = ? AND claimed_at < ?",
+            (PENDING, now, SENDING, now - timeout_seconds),
+        )
+
+    def stats(self) -> dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS total FROM outbox GROUP BY status").fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+
+class OutboxFlusher:
+    """Tarefa em segundo plano que envia as escritas pendentes ao ProRAF."""
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        send: Callable[[str, dict[str, Any]], Any],
+        max_concurrency: int,
+        poll_interval_seconds: float,
+        claim_timeout_seconds: float,
+    ) -> None:
+        self.outbox = outbox
+        self.send = send
+        self.max_concurrency = max_concurrency
+        self.poll_interval_seconds = poll_interval_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                sent = await self.flush_once()
+            except Exception as exc:
+                print(f"[OUTBOX] Erro no envio da fila: {exc}")
+                sent = 0
+            if not sent:
+                await asyncio.sleep(self.poll_interval_seconds)
+
+    async def flush_once(self) -> int:
+        await asyncio.to_thread(self.outbox.reclaim_stale, self.claim_timeout_seconds)
+        entries = await asyncio.to_thread(self.outbox.claim_heads, self.max_concurrency)
+        await asyncio.gather(*(asyncio.to_thread(self._deliver, entry) for entry in entries))
+        return len(entries)
+
+    def _deliver(self, entry: dict[str, Any]) -> None:
+        try:
+            result = self.send(entry["api_method"], entry["request_body"])
+        except Exception as exc:
+            result = {"success": False, "error": f"Erro ao executar operação: {exc}"}
+
+        if is_transient(result):
+            print(f"[OUTBOX] Falha temporária na escrita {entry['id']}: {result.get('error')}")
+            self.outbox.retry_later(entry["id"], entry["attempts"], str(result.get("error")))
+        else:
+            self.outbox.complete(entry["id"], result)
@@ -0,0 +1,69 @@
+"""
+Este arquivo centraliza a normalização de telefones.
+A ideia é que todas as rotas, caches e hashes HMAC usem a mesma forma
+canônica (DDD + número com nono dígito, somente dígitos), independente
+do telefone chegar em E.164, com máscara ou como JID do WhatsApp.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any
+
+# numero[:dispositivo]@servidor — ex: 5555996852212:12@s.whatsapp.net
+_JID_RE = re.compile(r"^(?P<user>[^@:]+)(?::\d+)?@(?P<server>[a-z.]+)$", re.IGNORECASE)
+_NON_DIGITS_RE = re.compile(r"\D+")
+
+# Servidores cujo identificador não é um telefone (grupos e LIDs anônimos).
+_OPAQUE_SERVERS = frozenset({"g.us", "lid", "broadcast", "newsletter"})
+
+BRAZIL_COUNTRY_CODE = "55"
+
+
+@lru_cache(maxsize=4096)
+def normalize_phone(raw: str | None) -> str:
+    """
+    Converte um telefone em qualquer formato aceito para a forma canônica.
+
+    Exemplos que resultam em "55996852212":
+    "55996852212", "+55 99685-2212", "5555996852212",
+    "555596852212@s.whatsapp.net" e "5555996852212:3@s.whatsapp.net".
+
+    JIDs de grupo e LIDs não carregam telefone; são devolvidos como
+    "identificador@servidor" em minúsculas para ainda servirem de chave estável.
+    """
+    value = (raw or "").strip()
+    if not value:
+        return ""
+
+    match = _JID_RE.match(value)
+    if match:
+        server = match.group("server").lower()
+        if server in _OPAQUE_SERVERS:
+            return f"{match.group('user').strip()}@{server}"
+        value = match.group("user")
+
+    digits = _NON_DIGITS_RE.sub("", value)
+
+    # Remove o código do país: 55 + DDD + 8 ou 9 dígitos.
+    if len(digits) in (12, 13) and digits.startswith(BRAZIL_COUNTRY_CODE):
+        digits = digits[2:]
+
+    # Celular antigo sem o nono dígito (comum em JIDs do WhatsApp).
+    if len(digits) == 10 and digits[2] in "6789":
+        digits = f"{digits[:2]}9{digits[2:]}"
+
+    return digits
+
+
+def extract_phones(response: Any) -> list[str]:
+    """Telefones normalizados da resposta de `listar_telefones` (lista crua ou objetos com `telefone`)."""
+    if isinstance(response, dict):
+        response = response.get("telefones") or response.get("phones") or []
+    phones = []
+    for item in response if isinstance(response, list) else []:
+        raw = item.get("telefone") if isinstance(item, dict) else item
+        if raw:
+            phones.append(normalize_phone(str(raw)))
+    return phones
@@ -0,0 +1,155 @@
+"""
+Este arquivo implementa a primeira etapa do planner em duas etapas.
+A ideia é identificar a intenção da mensagem localmente, sem IA: consultas
+simples ("listar meus produtos", "verificar meu telefone") viram um plano
+determinístico sem chamada ao modelo, e escritas (lote, produto, atualização)
+seguem para um prompt estreito com só os campos daquela operação. Mensagens
+sem intenção clara usam o prompt completo, como antes.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any
+
+from api_test.gate import normalize
+from api_test.prompts import (
+    CREATE_BATCH_PLANNER_PROMPT,
+    CREATE_PRODUCT_PLANNER_PROMPT,
+    CRUD_PLANNER_PROMPT,
+    UPDATE_PRODUCT_PLANNER_PROMPT,
+)
+from api_test.usage import estimate_tokens
+
+# Consultas sem parâmetros: o plano sai direto, sem IA. Casam a mensagem inteira.
+_LOCAL_PATTERNS: tuple[tuple[str, re.Pattern[str]], ...] = (
+    (
+        "list_products",
+        re.compile(
+            r"^(?:(?:por favor|quero|queria|pode|poderia|me)\s+)*"
+            r"(?:(?:listar|liste|lista|mostrar|mostre|mostra|ver|veja|exibir|exiba|quais sao|quais)\s+)?"
+            r"(?:(?:todos|os|meus|produtos que)\s+)*(?:meus\s+)?produtos"
+            r"(?:\s+(?:eu tenho|tenho|que eu tenho|cadastrados|que tenho cadastrados|eu tenho cadastrados|por favor))*$"
+        ),
+    ),
+    (
+        "verify_phone",
+        re.compile(
+            r"^(?:(?:por favor|quero|pode)\s+)*(?:verificar|verifique|verifica|confirmar|confirme|checar|cheque)\s+"
+            r"(?:(?:o|a|meu|minha)\s+)*(?:telefone|numero|cadastro|conta)(?:\s+por favor)?$"
+            r"|^(?:eu\s+)?(?:estou|to|sou)\s+cadastrad[oa]$"
+        ),
+    ),
+    (
+        "list_phones",
+        re.compile(
+            r"^(?:listar|liste|lista|mostrar|mostre|mostra|ver|quais sao os)\s+(?:(?:todos|os)\s+)*telefones"
+            r"(?:\s+cadastrados)?$"
+        ),
+    ),
+)
+
+_API_METHODS = {
+    "list_products": "listar_produtos",
+    "verify_phone": "verificar_telefone",
+    "list_phones": "listar_telefones",
+    "create_batch": "criar_lote",
+    "create_product": "criar_produto",
+    "update_product": "atualizar_produto",
+}
+
+# Escritas: palavras-chave decidem qual prompt estreito usar (o modelo ainda pode recusar).
+_QUANTITY_RE = re.compile(r"\b\d+(?:[.,]\d+)?\s*(?:kg|quilos?|kilos?|toneladas?|t|caixas?|unidades?|sacas?|sacos?)\b")
+_BATCH_RE = re.compile(r"\b(?:lotes?|colhi|colhemos|colheita|safra|produzi|produzimos)\b")
+_UPDATE_RE = re.compile(r"\b(?:atualiz\w*|alter\w*|mud[ae]\w*|edit\w*|corrig\w*)\b")
+_CREATE_RE = re.compile(r"\b(?:cadastr\w*|cri[ae]\w*|adicion\w*|registr\w*|bota|coloca|inclu\w*)\b")
+_NUMBER_RE = re.compile(r"\b\d+(?:[.,]\d+)?\b")
+
+NARROW_PROMPTS: dict[str, str] = {
+    "create_batch": CREATE_BATCH_PLANNER_PROMPT,
+    "create_product": CREATE_PRODUCT_PLANNER_PROMPT,
+    "update_product": UPDATE_PRODUCT_PLANNER_PROMPT,
+}
+
+_FULL_PROMPT_TOKENS = estimate_tokens(CRUD_PLANNER_PROMPT)
+
+
+def classify_intent(message: str) -> str | None:
+    """Operação provável da mensagem, ou None quando só o prompt completo resolve."""
+    text = normalize(message or "")
+    if not text or len(text) > 300:
+        return None
+    for operation, pattern in _LOCAL_PATTERNS:
+        if pattern.match(text):
+            return operation
+    if _BATCH_RE.search(text) or _QUANTITY_RE.search(text):
+        return "create_batch"
+    if _UPDATE_RE.search(text):
+        return "update_product"
+    if _CREATE_RE.search(text):
+        # "cadastra 200 abacaxis": quantidade sem unidade ainda é lote.
+        return "create_batch" if _NUMBER_RE.search(text) else "create_product"
+    return None
+
+
+def local_plan(operation: str, telefone: str | None) -> dict[str, Any]:
+    """Plano determinístico para as consultas reconhecidas localmente."""
+    request_body = {"telefone": telefone} if operation != "list_phones" else {}
+    return {
+        "operation": operation,
+        "api_method": _API_METHODS[operation],
+        "request_body": request_body,
+        "reason": "Intenção identificada localmente, sem chamada ao modelo.",
+    }
+
+
+def accepts(operation: str, planner_output: Any) -> bool:
+    """A resposta do prompt estreito vale se for a operação esperada ou uma recusa (`none`)."""
+    return isinstance(planner_output, dict) and planner_output.get("operation") in (operation, "none")
+
+
+class PlannerRouting:
+    """
+    Conta por qual caminho cada plano saiu e estima os tokens de prompt
+    economizados em relação ao prompt completo, por etapa.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: dict[str, int] = {"local": 0, "narrow": 0, "fallback": 0, "full": 0}
+        self.saved_by_stage: dict[str, int] = {}
+
+    def _save(self, stage: str, tokens: int) -> None:
+        self.saved_by_stage[stage] = self.saved_by_stage.get(stage, 0) + tokens
+
+    def record_local(self, operation: str, payload: str) -> None:
+        with self._lock:
+            self.counts["local"] += 1
+            # A chamada inteira ao planner foi evitada.
+            self._save(f"planner_{operation}", _FULL_PROMPT_TOKENS + estimate_tokens(payload))
+
+    def record_narrow(self, operation: str, accepted: bool) -> None:
+        narrow_tokens = estimate_tokens(NARROW_PROMPTS[operation])
+        with self._lock:
+            if accepted:
+                self.counts["narrow"] += 1
+                self._save(f"planner_{operation}", _FULL_PROMPT_TOKENS - narrow_tokens)
+            else:
+                # O prompt estreito foi gasto à toa antes do completo.
+                self.counts["fallback"] += 1
+                self._save(f"planner_{operation}", -narrow_tokens)
+
+    def record_full(self) -> None:
+        with self._lock:
+            self.counts["full"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counts,
+                "full_prompt_tokens": _FULL_PROMPT_TOKENS,
+                "narrow_prompt_tokens": {operation: estimate_tokens(prompt) for operation, prompt in NARROW_PROMPTS.items()},
+                "estimated_prompt_tokens_saved": dict(self.saved_by_stage),
+                "estimated_prompt_tokens_saved_total": sum(self.saved_by_stage.values()),
+            }
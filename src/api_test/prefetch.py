@@ -0,0 +1,74 @@
+"""
+Este arquivo implementa a pré-busca especulativa de dados do ProRAF.
+A ideia é disparar `listar_produtos` e `verificar_telefone` do telefone
+da conversa em paralelo com o planner da IA, para que a etapa CRUD
+encontre os dados já carregados em vez de fazer chamadas sequenciais.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from api_test.api_proraf import ProrafAPI
+
+PREFETCHED_METHODS = ("listar_produtos", "verificar_telefone")
+
+
+class PrefetchStats:
+    """Contadores de pré-busca: iniciadas, aproveitadas e desperdiçadas por método."""
+
+    def __init__(self) -> None:
+        self._counts = {method: {"started": 0, "used": 0, "wasted": 0} for method in PREFETCHED_METHODS}
+        self._lock = threading.Lock()
+
+    def add(self, method: str, counter: str) -> None:
+        with self._lock:
+            self._counts[method][counter] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            data: dict[str, Any] = {method: dict(values) for method, values in self._counts.items()}
+        for values in data.values():
+            finished = values["used"] + values["wasted"]
+            values["hit_rate"] = round(values["used"] / finished, 4) if finished else 0.0
+        return data
+
+
+class SpeculativePrefetch:
+    """
+    Pré-busca de uma requisição. Expõe `listar_produtos` e `verificar_telefone`
+    com a mesma assinatura do ProrafAPI: se o telefone for o pré-buscado, a
+    primeira chamada usa o resultado especulativo; as demais vão ao ProRAF.
+    """
+
+    def __init__(self, proraf: ProrafAPI, executor: ThreadPoolExecutor, stats: PrefetchStats, telefone: str):
+        self.proraf = proraf
+        self.stats = stats
+        self.telefone = telefone
+        self._futures: dict[str, Future] = {}
+        for method in PREFETCHED_METHODS:
+            # Copia o contexto para que as chamadas apareçam no trace da requisição.
+            self._futures[method] = executor.submit(contextvars.copy_context().run, getattr(proraf, method), telefone)
+            stats.add(method, "started")
+
+    def _take(self, method: str, telefone: str) -> Any:
+        future = self._futures.pop(method, None) if telefone == self.telefone else None
+        if future is None:
+            return getattr(self.proraf, method)(telefone)
+        self.stats.add(method, "used")
+        return future.result()
+
+    def listar_produtos(self, telefone: str) -> Any:
+        return self._take("listar_produtos", telefone)
+
+    def verificar_telefone(self, telefone: str) -> Any:
+        return self._take("verificar_telefone", telefone)
+
+    def close(self) -> None:
+        """Contabiliza como desperdiçadas as pré-buscas que não foram consumidas."""
+        for method in self._futures:
+            self.stats.add(method, "wasted")
+        self._futures.clear()
@@ -0,0 +1,179 @@
+"""
+Este arquivo implementa o profiling sob demanda das requisições do chatbot.
+A ideia é amostrar a pilha da thread que processa a requisição em intervalos
+fixos e gravar o resultado em formato "collapsed stacks" (compatível com
+flamegraph.pl e speedscope) num diretório em anel com número máximo de arquivos.
+Desligado, o custo é uma checagem de atributo por requisição.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+PROFILE_SUFFIX = ".folded"
+
+_SAFE_LABEL_RE = re.compile(r"[^a-zA-Z0-9_-]+")
+
+
+class _Session:
+    __slots__ = ("thread_id", "samples")
+
+    def __init__(self, thread_id: int) -> None:
+        self.thread_id = thread_id
+        self.samples: Counter[str] = Counter()
+
+
+def _collapse(frame: Any) -> str:
+    """Converte a pilha de um frame em `raiz;...;folha` (formato collapsed)."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    """
+    Amostra uma fração das requisições (`sample_rate`) ou todas, guardando só as
+    que passarem de `slow_threshold_ms`. Uma única thread amostra todas as sessões.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: float,
+        slow_threshold_ms: float,
+        interval_ms: float,
+        max_files: int,
+    ) -> None:
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.interval = interval_ms / 1000
+        self.max_files = max_files
+        self.enabled = sample_rate > 0 or slow_threshold_ms > 0
+        self._sessions: dict[int, _Session] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self.saved = 0
+
+    def wrap(self, label: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Devolve `fn` envolvida pelo profiler (ou a própria `fn`, se desligado)."""
+        if not self.enabled:
+            return fn
+
+        def profiled(*args: Any, **kwargs: Any) -> Any:
+            with self.profile(label):
+                return fn(*args, **kwargs)
+
+        return profiled
+
+    @contextmanager
+    def profile(self, label: str) -> Iterator[None]:
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_threshold_ms <= 0:
+            yield
+            return
+
+        session = _Session(threading.get_ident())
+        with self._lock:
+            self._sessions[session.thread_id] = session
+            self._ensure_sampler()
+        self._wakeup.set()
+
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            with self._lock:
+                self._sessions.pop(session.thread_id, None)
+            slow = self.slow_threshold_ms > 0 and elapsed_ms >= self.slow_threshold_ms
+            if (sampled or slow) and session.samples:
+                self._save(label, elapsed_ms, session)
+
+    def _ensure_sampler(self) -> None:
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._sampler.start()
+
+    def _run(self) -> None:
+        while True:
+            # Limpa antes de ler as sessões: uma sessão registrada depois da leitura
+            # já encontra o evento limpo e o seu set() acorda o sampler (sem wakeup perdido).
+            self._wakeup.clear()
+            with self._lock:
+                sessions = list(self._sessions.values())
+            if not sessions:
+                self._wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    session.samples[_collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _save(self, label: str, elapsed_ms: float, session: _Session) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        safe_label = _SAFE_LABEL_RE.sub("_", label)
+        name = f"{int(time.time() * 1000)}-{safe_label}-{int(elapsed_ms)}ms{PROFILE_SUFFIX}"
+        try:
+            with open(os.path.join(self.directory, name), "w", encoding="utf-8") as output:
+                for stack, count in session.samples.most_common():
+                    output.write(f"{stack} {count}\n")
+            self.saved += 1
+            self._trim()
+        except OSError as exc:
+            print(f"[PROFILE] Erro ao gravar profile {name}: {exc}")
+
+    def _trim(self) -> None:
+        """Mantém apenas os `max_files` profiles mais recentes."""
+        for name in self.list_profiles()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name["name"]))
+            except OSError:
+                pass
+
+    def list_profiles(self) -> list[dict[str, Any]]:
+        """Profiles gravados, do mais recente para o mais antigo."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(PROFILE_SUFFIX)]
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            profiles.append({"name": name, "size": stat.st_size, "created_at": stat.st_mtime})
+        return sorted(profiles, key=lambda profile: profile["name"], reverse=True)
+
+    def profile_path(self, name: str) -> str | None:
+        """Caminho do profile, ou None se o nome não for um profile existente do anel."""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "active_sessions": len(self._sessions),
+            "saved": self.saved,
+        }
@@ -0,0 +1,245 @@
+"""
+Este arquivo implementa um servidor local que imita os endpoints WhatsApp do ProRAF.
+A ideia é ter um substituto para testes e benchmarks que valide o HMAC como o
+backend real e implemente compressão gzip e revalidação por ETag/Last-Modified
+nas leituras de catálogo (`/whatsapp/phones` e `/whatsapp/list-products`).
+
+Uso:
+    python -m api_test.proraf_stub --port 8001 --secret-key minha-chave
+    PRORAF_API_BASE_URL=http://localhost:8001 poetry run task server
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import hmac
+import json
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+
+class ProrafStubStore:
+    """Estado em memória: usuários, produtos e lotes por telefone."""
+
+    def __init__(self, secret_key: str) -> None:
+        self.secret_key = secret_key
+        self.lock = threading.Lock()
+        self.users: dict[str, dict[str, Any]] = {}
+        self.products: dict[str, list[dict[str, Any]]] = {}
+        self.updated_at: dict[str, float] = {}
+        self.phones_updated_at = time.time()
+        self.next_product_id = 1
+        self.next_batch_id = 1
+
+    def valid_hash(self, value: str, received: str | None) -> bool:
+        expected = hmac.new(self.secret_key.encode("utf-8"), value.encode("utf-8"), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, received or "")
+
+    def add_user(self, telefone: str, nome: str = "Produtor Teste") -> None:
+        with self.lock:
+            self.users[telefone] = {
+                "exists": True,
+                "user_id": len(self.users) + 1,
+                "nome": nome,
+                "email": f"{telefone}@exemplo.com",
+                "tipo_pessoa": "F",
+            }
+            self.products.setdefault(telefone, [])
+            self.updated_at[telefone] = time.time()
+            self.phones_updated_at = time.time()
+
+
+class ProrafStubHandler(BaseHTTPRequestHandler):
+    server: "ProrafStubServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return None
+
+    def _read_json(self) -> dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except json.JSONDecodeError:
+            return {}
+
+    def _send_json(self, status: int, data: Any, last_modified: float | None = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+
+        if last_modified is not None:
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            headers["ETag"] = etag
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+            if self._not_modified(etag, last_modified):
+                self.send_response(304)
+                for name, value in headers.items():
+                    if name != "Content-Type":
+                        self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag: str, last_modified: float) -> bool:
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [value.strip() for value in if_none_match.split(",")]
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _authorized_phone(self, payload: dict[str, Any]) -> str | None:
+        telefone = str(payload.get("telefone") or "")
+        if not telefone or not self.server.store.valid_hash(telefone, payload.get("hash")):
+            self._send_json(401, {"detail": "Hash inválido"})
+            return None
+        return telefone
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        store = self.server.store
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif url.path == "/whatsapp/phones":
+            received = parse_qs(url.query).get("hash", [""])[0]
+            if not store.valid_hash("PHONE_LIST", received):
+                self._send_json(401, {"detail": "Hash inválido"})
+                return
+            with store.lock:
+                phones = sorted(store.users)
+                updated_at = store.phones_updated_at
+            self._send_json(200, phones, last_modified=updated_at)
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_POST(self) -> None:
+        payload = self._read_json()
+        store = self.server.store
+        telefone = self._authorized_phone(payload)
+        if telefone is None:
+            return
+
+        if self.path == "/whatsapp/verify-phone":
+            with store.lock:
+                user = store.users.get(telefone)
+            self._send_json(200, user or {"exists": False})
+            return
+
+        with store.lock:
+            known = telefone in store.users
+        if not known:
+            self._send_json(404, {"detail": "Usuário não encontrado"})
+            return
+
+        if self.path == "/whatsapp/list-products":
+            with store.lock:
+                products = list(store.products[telefone])
+                updated_at = store.updated_at[telefone]
+            self._send_json(200, {"success": True, "products": products}, last_modified=updated_at)
+        elif self.path == "/whatsapp/create-product":
+            with store.lock:
+                product = {
+                    "id": store.next_product_id,
+                    "name": payload.get("name"),
+                    "description": payload.get("description"),
+                    "variedade_cultivar": payload.get("variedade_cultivar"),
+                }
+                store.next_product_id += 1
+                store.products[telefone].append(product)
+                store.updated_at[telefone] = time.time()
+            self._send_json(
+                201,
+                {
+                    "success": True,
+                    "product_id": product["id"],
+                    "product_name": product["name"],
+                    "qrcode_url": f"/qrcode/produto/{product['id']}",
+                },
+            )
+        elif self.path == "/whatsapp/create-batch":
+            with store.lock:
+                batch_id = store.next_batch_id
+                store.next_batch_id += 1
+            self._send_json(
+                201,
+                {"success": True, "batch_id": batch_id, "batch_code": f"LOTE-{batch_id:06d}"},
+            )
+        else:
+            self._send_json(404, {"detail": "Not Found"})
+
+    def do_PUT(self) -> None:
+        payload = self._read_json()
+        store = self.server.store
+        telefone = self._authorized_phone(payload)
+        if telefone is None:
+            return
+        if self.path != "/whatsapp/update-product":
+            self._send_json(404, {"detail": "Not Found"})
+            return
+
+        with store.lock:
+            product = next(
+                (item for item in store.products.get(telefone, []) if item["id"] == payload.get("product_id")),
+                None,
+            )
+            if product is not None:
+                for field in ("description", "comertial_name"):
+                    if payload.get(field):
+                        product[field] = payload[field]
+                store.updated_at[telefone] = time.time()
+        if product is None:
+            self._send_json(404, {"detail": "Produto não encontrado"})
+        else:
+            self._send_json(200, {"success": True, "product": product})
+
+
+class ProrafStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], store: ProrafStubStore) -> None:
+        super().__init__(address, ProrafStubHandler)
+        self.store = store
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor local que imita os endpoints WhatsApp do ProRAF.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--secret-key", required=True, help="Mesmo valor de PRORAF_SECRET_KEY da API.")
+    parser.add_argument("--phone", action="append", default=[], help="Telefone cadastrado (pode repetir).")
+    args = parser.parse_args(argv)
+
+    store = ProrafStubStore(args.secret_key)
+    for telefone in args.phone:
+        store.add_user(telefone)
+
+    server = ProrafStubServer((args.host, args.port), store)
+    print(f"ProRAF stub em http://{args.host}:{args.port} ({len(args.phone)} telefone(s))")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Este arquivo implementa o escalonamento justo das mensagens do chatbot por telefone.
+A ideia é que cada telefone tenha sua própria fila e as vagas do chatbot sejam
+distribuídas em rodízio (round-robin) entre os telefones com mensagens
+esperando: um produtor ou uma integração que dispara muitas mensagens só
+ocupa até `phone_max_inflight` vagas e espera a própria vez na fila, sem
+aumentar a latência dos demais. Filas cheias são recusadas com Retry-After.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from api_test.admission import AdmissionRejected
+
+# Mensagens sem telefone dividem uma mesma fila, sem os limites por telefone:
+# continuam com a lane inteira, como antes do escalonador, e entram no rodízio.
+ANONYMOUS_KEY = ""
+
+
+class FairScheduler:
+    """
+    Escalonador round-robin por telefone, usado só no event loop (sem locks).
+    `max_inflight` deve ser no máximo o limite da lane do chatbot, para que a
+    lane nunca recuse uma mensagem que já passou pela fila.
+    """
+
+    def __init__(
+        self,
+        max_inflight: int,
+        phone_max_inflight: int,
+        phone_max_queued: int,
+        max_queued: int,
+        retry_after: int,
+    ) -> None:
+        self.max_inflight = max_inflight
+        self.phone_max_inflight = phone_max_inflight
+        self.phone_max_queued = phone_max_queued
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self._queues: dict[str, deque[asyncio.Future]] = {}
+        self._inflight_by_phone: dict[str, int] = {}
+        # Telefones com mensagem esperando e vaga própria, na ordem do rodízio.
+        self._ready: deque[str] = deque()
+        self._in_ready: set[str] = set()
+        self.inflight = 0
+        self.queued = 0
+        self.served = 0
+        self.rejected = 0
+
+    async def run(self, key: str | None, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """Espera a vez do telefone `key` e então executa `await fn(*args, **kwargs)`."""
+        key = key or ANONYMOUS_KEY
+        queue = self._queues.setdefault(key, deque())
+        phone_max_queued = self.max_queued if key == ANONYMOUS_KEY else self.phone_max_queued
+        if len(queue) >= phone_max_queued or self.queued >= self.max_queued:
+            self.rejected += 1
+            if not queue and not self._inflight_by_phone.get(key):
+                del self._queues[key]
+            raise AdmissionRejected("chatbot_fila", self.retry_after)
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.queued += 1
+        self._mark_ready(key)
+        self._dispatch()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga chegou junto com o cancelamento: devolve.
+                self._release(key)
+            else:
+                if waiter in queue:
+                    queue.remove(waiter)
+                    self.queued -= 1
+                self._forget(key)
+            raise
+
+        # A vaga só volta quando `fn` termina de fato: se o cliente desconectar, o
+        # trabalho segue (a lane não interrompe threads) e continua contando.
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        self._release(key)
+        if not task.cancelled():
+            # Marca a exceção como lida: quem esperava pode já ter sido cancelado.
+            task.exception()
+
+    def _mark_ready(self, key: str) -> None:
+        if (
+            key not in self._in_ready
+            and self._queues.get(key)
+            and self._inflight_by_phone.get(key, 0) < self._phone_max_inflight(key)
+        ):
+            self._ready.append(key)
+            self._in_ready.add(key)
+
+    def _phone_max_inflight(self, key: str) -> int:
+        return self.max_inflight if key == ANONYMOUS_KEY else self.phone_max_inflight
+
+    def _dispatch(self) -> None:
+        while self.inflight < self.max_inflight and self._ready:
+            key = self._ready.popleft()
+            self._in_ready.discard(key)
+            queue = self._queues.get(key)
+            if not queue:
+                continue
+
+            waiter = queue.popleft()
+            self.queued -= 1
+            if waiter.done():
+                # Cancelada enquanto esperava; passa para a próxima do telefone.
+                self._mark_ready(key)
+                continue
+            self.inflight += 1
+            self.served += 1
+            self._inflight_by_phone[key] = self._inflight_by_phone.get(key, 0) + 1
+            waiter.set_result(None)
+            # Volta para o fim do rodízio se ainda tiver mensagens e vaga própria.
+            self._mark_ready(key)
+
+    def _release(self, key: str) -> None:
+        self.inflight -= 1
+        self._inflight_by_phone[key] -= 1
+        self._forget(key)
+        self._mark_ready(key)
+        self._dispatch()
+
+    def _forget(self, key: str) -> None:
+        if not self._queues.get(key) and not self._inflight_by_phone.get(key):
+            self._queues.pop(key, None)
+            self._inflight_by_phone.pop(key, None)
+
+    def stats(self, top: int = 20) -> dict[str, Any]:
+        phones = sorted(
+            (
+                {"telefone": key, "queued": len(self._queues.get(key) or ()), "inflight": self._inflight_by_phone.get(key, 0)}
+                for key in self._queues
+            ),
+            key=lambda item: (item["queued"], item["inflight"]),
+            reverse=True,
+        )
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "queued": self.queued,
+            "served": self.served,
+            "rejected": self.rejected,
+            "phone_max_inflight": self.phone_max_inflight,
+            "phones_active": len(phones),
+            "phones": phones[:top],
+        }
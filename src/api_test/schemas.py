@@ -4,6 +4,8 @@ A ideia é centralizar modelos Pydantic para garantir validação
 consistente e facilitar manutenção das rotas.
 """
 
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -15,7 +17,18 @@ class MessageInput(BaseModel):
     message: str = Field(..., description="Mensagem do usuário para o chatbot.")
     telefone: str | None = Field(
         default=None,
-        description="Telefone do usuário para operações no ProRAF (somente números).",
+        description=(
+            "Telefone do usuário para operações no ProRAF. Aceita E.164, máscara "
+            "ou JID do WhatsApp; é normalizado para DDD + número."
+        ),
+    )
+    profile: Literal["whatsapp", "full", "debug"] = Field(
+        default="full",
+        description=(
+            "Campos da resposta. `whatsapp`: só `whatsapp_message` e `operation` "
+            "(pula a geração de `assistant_message`); `full`: resposta completa; "
+            "`debug`: completa com `request_body` executado e tempos por etapa."
+        ),
     )
 
     model_config = {
@@ -40,4 +53,7 @@ class TelefoneInput(BaseModel):
                 "telefone": "55996852212@s.whatsapp.net",
             }
         }
-    }
\ No newline at end of file
+    }
+
+class WebSocketMessageInput(MessageInput):
+    id: str = Field(..., description="Identificador de correlação devolvido junto com a resposta.")
@@ -5,6 +5,7 @@ facilitando importação e manutenção em todo o projeto.
 """
 
 import os
+import tempfile
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,6 +17,69 @@ class Settings(BaseSettings):
     proraf_api_key: str = os.getenv("PRORAF_API_KEY") or os.getenv("API_KEY") or ""
     proraf_secret_key: str = os.getenv("PRORAF_SECRET_KEY") or os.getenv("SECRET_KEY") or "your-secret-key-here-change-in-production-32-chars-min"
     proraf_frontend_url: str = os.getenv("PRORAF_FRONTEND_URL") or "https://proraf.com.br"
+    warmup_on_startup: bool = True
+    warmup_timeout_seconds: float = 5.0
+    cache_backend: str = "memory"
+    cache_ttl_seconds: float = 120
+    cache_max_entries: int = 10000
+    cache_sqlite_path: str = os.path.join(tempfile.gettempdir(), "api_test_cache.sqlite3")
+    planner_cache_ttl_seconds: float = 3600
+    planner_two_stage: bool = True
+    prefetch_enabled: bool = True
+    # 0 = duas pré-buscas por vaga da lane do chatbot (2 × ADMISSION_CHATBOT_MAX_INFLIGHT).
+    prefetch_max_workers: int = 0
+    catalog_warmup_enabled: bool = False
+    catalog_warmup_interval_seconds: float = 600
+    catalog_warmup_active_window_seconds: float = 172800
+    catalog_warmup_concurrency: int = 4
+    catalog_warmup_max_calls_per_second: float = 5
+    # 0 = TTL normal do cache, limitado ao intervalo; maior que isso é opt-in.
+    catalog_warmup_ttl_seconds: float = 0
+    activity_sqlite_path: str = os.path.join(tempfile.gettempdir(), "api_test_activity.sqlite3")
+    catalog_mirror_enabled: bool = False
+    catalog_mirror_interval_seconds: float = 60
+    catalog_mirror_batch_size: int = 500
+    catalog_mirror_concurrency: int = 4
+    memory_enabled: bool = True
+    memory_max_turns: int = 6
+    memory_max_tokens: int = 200
+    memory_idle_ttl_seconds: float = 1800
+    memory_max_phones: int = 10000
+    admission_chatbot_max_inflight: int = 16
+    admission_phone_max_inflight: int = 32
+    admission_retry_after_seconds: int = 5
+    scheduler_phone_max_inflight: int = 2
+    scheduler_phone_max_queued: int = 20
+    scheduler_max_queued: int = 256
+    ws_max_inflight: int = 16
+    llm_result_token_budget: int = 1500
+    llm_result_max_items: int = 50
+    gate_enabled: bool = True
+    reply_cache_ttl_seconds: float = 3600
+    outbox_enabled: bool = False
+    outbox_sqlite_path: str = os.path.join(tempfile.gettempdir(), "api_test_outbox.sqlite3")
+    outbox_max_concurrency: int = 4
+    outbox_max_attempts: int = 8
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_claim_timeout_seconds: float = 120
+    import_max_concurrency: int = 8
+    export_max_concurrency: int = 4
+    tracing_enabled: bool = False
+    tracing_path: str = os.path.join(tempfile.gettempdir(), "api_test_traces.jsonl")
+    tracing_sample_rate: float = 0.01
+    tracing_slow_threshold_ms: float = 3000
+    tracing_max_bytes: int = 50_000_000
+    health_probe_interval_seconds: float = 10
+    health_probe_timeout_seconds: float = 3
+    health_latency_window: int = 256
+    circuit_failure_threshold: int = 5
+    circuit_reset_seconds: float = 30
+    admin_token: str = ""
+    profiling_sample_rate: float = 0.0
+    profiling_slow_threshold_ms: float = 0.0
+    profiling_interval_ms: float = 5.0
+    profiling_dir: str = os.path.join(tempfile.gettempdir(), "api_test_profiles")
+    profiling_max_files: int = 50
 
     model_config = SettingsConfigDict(
         env_file=".env",
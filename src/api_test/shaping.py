@@ -0,0 +1,74 @@
+"""
+Este arquivo reduz o resultado da API ProRAF antes de enviá-lo à IA.
+A ideia é projetar cada `api_method` apenas nos campos que os prompts de
+resposta usam, cortar listas longas informando quantos itens ficaram de fora
+e garantir um teto de tokens por chamada, para que catálogos grandes não
+inflem latência, custo ou estourem a janela de contexto.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from api_test.usage import estimate_tokens
+
+# Campos comuns de status/erro mantidos em qualquer operação.
+_STATUS_FIELDS = ("success", "error", "message", "detail", "status_code", "queued", "outbox_id", "status")
+
+# Campos usados pelos prompts de resposta, por método.
+_FIELDS_BY_METHOD: dict[str, tuple[str, ...]] = {
+    "verificar_telefone": ("exists", "user_id", "nome", "email", "tipo_pessoa"),
+    "criar_produto": ("product_id", "product_name", "qrcode_url"),
+    "criar_lote": ("batch_id", "batch_code", "batch_number", "product_name", "talhao", "producao", "unidadeMedida"),
+    "atualizar_produto": ("product_id",),
+}
+
+# Listas que podem crescer com a fazenda: (campo, campos mantidos de cada item).
+_LIST_FIELDS: dict[str, tuple[str, tuple[str, ...] | None]] = {
+    "listar_produtos": ("products", ("id", "name")),
+    "listar_telefones": ("phones", None),
+}
+
+_PRODUCT_FIELDS = ("id", "name", "comertial_name", "description")
+
+
+def _project_item(item: Any, fields: tuple[str, ...] | None) -> Any:
+    if fields is None or not isinstance(item, dict):
+        return item
+    return {field: item[field] for field in fields if item.get(field) is not None}
+
+
+def shape_api_result(api_method: str | None, result: Any, max_tokens: int, max_items: int = 50) -> Any:
+    """
+    Devolve uma versão reduzida de `result` para os prompts.
+    Listas são cortadas (com `total` e `itens_omitidos`) até caber em `max_tokens`.
+    """
+    if not isinstance(result, dict):
+        return result
+
+    shaped = {field: result[field] for field in _STATUS_FIELDS if field in result}
+    for field in _FIELDS_BY_METHOD.get(api_method or "", ()):
+        if result.get(field) is not None:
+            shaped[field] = result[field]
+    if api_method == "atualizar_produto" and isinstance(result.get("product"), dict):
+        shaped["product"] = _project_item(result["product"], _PRODUCT_FIELDS)
+    if api_method not in _FIELDS_BY_METHOD and api_method not in _LIST_FIELDS:
+        # Método desconhecido: mantém só valores simples.
+        shaped.update({key: value for key, value in result.items() if isinstance(value, (str, int, float, bool))})
+
+    list_field, item_fields = _LIST_FIELDS.get(api_method or "", (None, None))
+    items = result.get(list_field) if list_field else None
+    if not isinstance(items, list):
+        return shaped
+
+    projected = [_project_item(item, item_fields) for item in items[:max_items]]
+    shaped["total"] = len(items)
+    while True:
+        shaped[list_field] = projected
+        omitted = len(items) - len(projected)
+        if omitted:
+            shaped["itens_omitidos"] = omitted
+        if not projected or estimate_tokens(json.dumps(shaped, ensure_ascii=False)) <= max_tokens:
+            return shaped
+        projected = projected[: len(projected) // 2]
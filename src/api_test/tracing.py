@@ -0,0 +1,222 @@
+"""
+Este arquivo implementa o tracing por requisição.
+A ideia é montar uma árvore de spans (rota, planner, resolução de produto,
+chamadas ao ProRAF e à OpenAI) usando contextvars, e gravar cada trace como
+uma linha JSON num arquivo local. A amostragem é feita no fim do trace
+(tail-based): traces lentos ou com erro são sempre mantidos; os demais,
+numa fração configurada. Fora de um trace, `span()` não custa quase nada.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("api_test_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "started_at", "duration_ms", "attributes", "status", "error")
+
+    def __init__(self, trace: "_Trace", name: str, parent_id: str | None, attributes: dict[str, Any]) -> None:
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.started_at = time.time()
+        self.duration_ms: float | None = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: str | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def fail(self, error: str) -> None:
+        self.status = "error"
+        self.error = error[:500]
+
+    def to_dict(self) -> dict[str, Any]:
+        data = {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.started_at, 6),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class _NoopSpan:
+    """Span usado fora de um trace: aceita as mesmas chamadas e não registra nada."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        return None
+
+    def fail(self, error: str) -> None:
+        return None
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    __slots__ = ("tracer", "trace_id", "spans", "lock", "closed")
+
+    def __init__(self, tracer: "Tracer") -> None:
+        self.tracer = tracer
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+
+def current_span() -> Span | _NoopSpan:
+    return _current_span.get() or NOOP_SPAN
+
+
+@contextmanager
+def _activate(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    started_at = time.perf_counter()
+    try:
+        yield span
+    except BaseException as exc:
+        span.fail(f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        span.duration_ms = round((time.perf_counter() - started_at) * 1000, 2)
+        _current_span.reset(token)
+        with span.trace.lock:
+            # Spans que terminam depois do fim do trace (ex: pré-busca descartada) ficam de fora.
+            if not span.trace.closed:
+                span.trace.spans.append(span)
+
+
+@contextmanager
+def span(name: str, /, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """Abre um span filho do span atual; sem trace ativo, não faz nada."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    with _activate(Span(parent.trace, name, parent.span_id, attributes)) as child:
+        yield child
+
+
+class Tracer:
+    """Cria traces raiz e grava no arquivo JSONL os que passarem pela amostragem."""
+
+    def __init__(
+        self,
+        path: str,
+        enabled: bool,
+        sample_rate: float,
+        slow_threshold_ms: float,
+        max_bytes: int,
+    ) -> None:
+        self.path = path
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.counts = {"finished": 0, "kept": 0, "dropped": 0}
+
+    @contextmanager
+    def trace(self, name: str, /, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+        root = self.open(name, **attributes)
+        try:
+            with self.activate(root):
+                yield root
+        finally:
+            self.close(root)
+
+    def open(self, name: str, /, **attributes: Any) -> Span | _NoopSpan:
+        """
+        Cria o span raiz sem encerrá-lo: para respostas em streaming, o trace só
+        termina em `close`, depois que o corpo foi enviado.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(_Trace(self), name, None, attributes)
+
+    @contextmanager
+    def activate(self, root: Span | _NoopSpan) -> Iterator[Span | _NoopSpan]:
+        """Torna `root` o span atual; spans abertos dentro do bloco (e de tarefas criadas nele) viram filhos."""
+        if isinstance(root, _NoopSpan):
+            yield root
+            return
+        with _activate(root):
+            yield root
+
+    def close(self, root: Span | _NoopSpan) -> None:
+        """Encerra o trace (a duração vai até agora) e aplica a amostragem."""
+        if isinstance(root, _NoopSpan):
+            return
+        root.duration_ms = round((time.time() - root.started_at) * 1000, 2)
+        self._finish(root)
+
+    def _finish(self, root: Span) -> None:
+        trace = root.trace
+        with trace.lock:
+            if trace.closed:
+                return
+            trace.closed = True
+            spans = list(trace.spans)
+
+        failed = any(item.status == "error" for item in spans)
+        slow = self.slow_threshold_ms > 0 and (root.duration_ms or 0) >= self.slow_threshold_ms
+        keep = failed or slow or random.random() < self.sample_rate
+        with self._lock:
+            self.counts["finished"] += 1
+            self.counts["kept" if keep else "dropped"] += 1
+        if keep:
+            self._export(
+                {
+                    "trace_id": trace.trace_id,
+                    "name": root.name,
+                    "duration_ms": root.duration_ms,
+                    "status": "error" if failed else "ok",
+                    "slow": slow,
+                    "spans": [item.to_dict() for item in sorted(spans, key=lambda item: item.started_at)],
+                }
+            )
+
+    def _export(self, data: dict[str, Any]) -> None:
+        line = json.dumps(data, ensure_ascii=False, default=str) + "\n"
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # Rotação simples: o arquivo cheio vira `.1` e um novo é iniciado.
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, "a", encoding="utf-8") as output:
+                    output.write(line)
+        except OSError as exc:
+            print(f"[TRACE] Erro ao gravar trace: {exc}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "path": self.path,
+                "sample_rate": self.sample_rate,
+                "slow_threshold_ms": self.slow_threshold_ms,
+                **self.counts,
+            }
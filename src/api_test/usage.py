@@ -0,0 +1,90 @@
+"""
+Este arquivo contabiliza o consumo de tokens das chamadas à OpenAI.
+A ideia é registrar o `usage` de cada chamada (incluindo tokens servidos
+pelo prompt caching automático) por etapa e modelo, agregando por telefone
+e globalmente para expor em um endpoint.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+_FIELDS = ("calls", "prompt_tokens", "cached_tokens", "completion_tokens", "total_tokens")
+
+
+def _empty() -> dict[str, int]:
+    return dict.fromkeys(_FIELDS, 0)
+
+
+def _with_rates(totals: dict[str, int]) -> dict[str, Any]:
+    data: dict[str, Any] = dict(totals)
+    prompt = totals["prompt_tokens"]
+    data["cached_ratio"] = round(totals["cached_tokens"] / prompt, 4) if prompt else 0.0
+    return data
+
+
+def extract_usage(response: Any) -> dict[str, int]:
+    """Extrai os contadores de tokens de uma resposta do SDK (campos ausentes viram 0)."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+    }
+
+
+class UsageTracker:
+    """Agregador thread-safe de uso de tokens por etapa/modelo, global e por telefone."""
+
+    def __init__(self, max_phones: int = 10000) -> None:
+        self.max_phones = max_phones
+        self._global = _empty()
+        self._by_stage: dict[str, dict[str, int]] = {}
+        # Por telefone: LRU limitado para não crescer sem controle.
+        self._by_phone: OrderedDict[str, dict[str, dict[str, int]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, model: str, usage: dict[str, int], telefone: str | None = None) -> None:
+        key = f"{stage}:{model}"
+        with self._lock:
+            buckets = [self._global, self._by_stage.setdefault(key, _empty())]
+            if telefone:
+                phone_stages = self._by_phone.get(telefone)
+                if phone_stages is None:
+                    phone_stages = self._by_phone[telefone] = {"total": _empty()}
+                    if len(self._by_phone) > self.max_phones:
+                        self._by_phone.popitem(last=False)
+                else:
+                    self._by_phone.move_to_end(telefone)
+                buckets += [phone_stages["total"], phone_stages.setdefault(key, _empty())]
+
+            for bucket in buckets:
+                bucket["calls"] += 1
+                for field in _FIELDS[1:]:
+                    bucket[field] += usage.get(field, 0)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "global": _with_rates(self._global),
+                "by_stage": {key: _with_rates(value) for key, value in self._by_stage.items()},
+                "phones_tracked": len(self._by_phone),
+            }
+
+    def phone_snapshot(self, telefone: str) -> dict[str, Any] | None:
+        with self._lock:
+            phone_stages = self._by_phone.get(telefone)
+            if phone_stages is None:
+                return None
+            return {key: _with_rates(value) for key, value in phone_stages.items()}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token) para limitar prompts."""
+    return len(text) // 4 + 1
@@ -0,0 +1,170 @@
+"""
+Este arquivo implementa o aquecimento periódico de catálogos em segundo plano.
+A ideia é usar `listar_telefones` para saber quais telefones estão cadastrados
+e pré-carregar no cache os catálogos dos que conversaram recentemente, com
+concorrência limitada e teto de chamadas por segundo ao ProRAF. A atividade
+pode ficar num arquivo SQLite, compartilhado pelos workers e preservado entre
+reinícios, e os catálogos aquecidos ficam no cache até o próximo ciclo.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from api_test.api_proraf import ProrafAPI
+from api_test.phone import extract_phones
+
+
+class ActivityTracker:
+    """
+    Registra o último contato de cada telefone (LRU limitado). Com `path`, também
+    grava em SQLite (modo WAL), e `active_since` passa a ler de lá: a atividade é
+    a mesma para todos os workers e sobrevive a reinícios.
+    """
+
+    # Intervalo mínimo entre gravações do mesmo telefone no SQLite.
+    PERSIST_EVERY_SECONDS = 60
+
+    def __init__(self, max_phones: int = 10000, path: str | None = None) -> None:
+        self.max_phones = max_phones
+        self.path = path
+        self._last_seen: OrderedDict[str, float] = OrderedDict()
+        self._persisted_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS activity (telefone TEXT PRIMARY KEY, last_seen REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def touch(self, telefone: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._last_seen[telefone] = now
+            self._last_seen.move_to_end(telefone)
+            if len(self._last_seen) > self.max_phones:
+                evicted, _ = self._last_seen.popitem(last=False)
+                self._persisted_at.pop(evicted, None)
+            persist = self.path and now - self._persisted_at.get(telefone, 0.0) >= self.PERSIST_EVERY_SECONDS
+            if persist:
+                self._persisted_at[telefone] = now
+        if persist:
+            try:
+                self._conn().execute(
+                    "INSERT OR REPLACE INTO activity (telefone, last_seen) VALUES (?, ?)", (telefone, now)
+                )
+            except sqlite3.Error as exc:
+                print(f"[WARMUP] Erro ao gravar atividade de {telefone}: {exc}")
+
+    def active_since(self, since: float) -> list[str]:
+        if self.path:
+            try:
+                conn = self._conn()
+                # Quem está fora da janela não volta a ser consultado.
+                conn.execute("DELETE FROM activity WHERE last_seen < ?", (since,))
+                rows = conn.execute(
+                    "SELECT telefone FROM activity ORDER BY last_seen DESC LIMIT ?", (self.max_phones,)
+                ).fetchall()
+                return [row[0] for row in rows]
+            except sqlite3.Error as exc:
+                print(f"[WARMUP] Erro ao ler atividade: {exc}")
+        with self._lock:
+            return [phone for phone, seen in self._last_seen.items() if seen >= since]
+
+
+class CatalogWarmer:
+    """
+    Tarefa em segundo plano que pré-carrega catálogos no cache do ProrafAPI.
+    As entradas aquecidas valem `ttl_seconds` (por padrão o TTL normal do cache,
+    limitado ao intervalo), para que mudanças feitas fora da API não fiquem
+    escondidas por mais tempo que numa leitura comum.
+    """
+
+    def __init__(
+        self,
+        proraf: ProrafAPI,
+        activity: ActivityTracker,
+        interval_seconds: float,
+        active_window_seconds: float,
+        max_concurrency: int,
+        max_calls_per_second: float,
+        ttl_seconds: float,
+    ) -> None:
+        self.proraf = proraf
+        self.activity = activity
+        self.interval_seconds = interval_seconds
+        self.active_window_seconds = active_window_seconds
+        self.max_concurrency = max_concurrency
+        self.min_call_interval = 1 / max_calls_per_second if max_calls_per_second > 0 else 0
+        self.ttl_seconds = ttl_seconds
+        self._task: asyncio.Task | None = None
+        self._next_call_at = 0.0
+        self._rate_lock = asyncio.Lock()
+        self.stats: dict[str, Any] = {"runs": 0, "warmed": 0, "errors": 0, "last_run_at": None, "last_run_ms": None}
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                print(f"[WARMUP] Erro no aquecimento de catálogos: {exc}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def _throttle(self) -> None:
+        """Garante o teto de chamadas por segundo entre todas as tarefas."""
+        async with self._rate_lock:
+            delay = self._next_call_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_call_at = time.monotonic() + self.min_call_interval
+
+    async def run_once(self) -> int:
+        started_at = time.perf_counter()
+        active = self.activity.active_since(time.time() - self.active_window_seconds)
+        warmed = 0
+        if active:
+            await self._throttle()
+            registered = set(extract_phones(await asyncio.to_thread(self.proraf.listar_telefones)))
+            targets = [phone for phone in active if phone in registered]
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def warm(telefone: str) -> bool:
+                async with semaphore:
+                    await self._throttle()
+                    # Busca a versão atual e regrava com TTL até o próximo ciclo (fora do event loop).
+                    return await asyncio.to_thread(self.proraf.aquecer_produtos, telefone, self.ttl_seconds)
+
+            results = await asyncio.gather(*(warm(phone) for phone in targets))
+            warmed = sum(results)
+            self.stats["errors"] += len(results) - warmed
+
+        self.stats["runs"] += 1
+        self.stats["warmed"] += warmed
+        self.stats["last_run_at"] = time.time()
+        self.stats["last_run_ms"] = round((time.perf_counter() - started_at) * 1000, 2)
+        return warmed
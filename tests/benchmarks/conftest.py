@@ -0,0 +1,111 @@
+"""
+Infraestrutura dos micro-benchmarks do caminho quente.
+A fixture `bench` mede o tempo por chamada (melhor de várias repetições)
+e compara com o valor guardado em `baselines.json`: o teste falha quando a
+regressão passa do limite (`BENCH_THRESHOLD`, padrão 0.5 = 50% mais lento).
+Os baselines são tempos absolutos da máquina em que foram gravados, por isso
+os benchmarks só rodam quando pedidos (fora do `pytest` comum):
+
+    BENCH=1 pytest tests/benchmarks
+
+Para regravar os baselines na máquina atual:
+
+    BENCH_SAVE=1 pytest tests/benchmarks
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import timeit
+from typing import Any, Callable
+
+import pytest
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_THRESHOLD = 0.5
+REPEAT = 5
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "") not in ("", "0", "false")
+
+
+def _load_baselines() -> dict[str, float]:
+    try:
+        with open(BASELINES_PATH, encoding="utf-8") as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return {}
+
+
+class BenchmarkSession:
+    def __init__(self, save: bool, threshold: float) -> None:
+        self.save = save
+        self.threshold = threshold
+        self.baselines = _load_baselines()
+        self.results: dict[str, float] = {}
+
+    def write(self) -> None:
+        merged = {**self.baselines, **self.results}
+        with open(BASELINES_PATH, "w", encoding="utf-8") as output:
+            json.dump(dict(sorted(merged.items())), output, indent=2)
+            output.write("\n")
+
+
+@pytest.fixture(scope="session")
+def bench_session(pytestconfig: pytest.Config) -> BenchmarkSession:
+    session = BenchmarkSession(
+        save=_env_flag("BENCH_SAVE"),
+        threshold=float(os.getenv("BENCH_THRESHOLD", DEFAULT_THRESHOLD)),
+    )
+    pytestconfig._bench_session = session
+    return session
+
+
+@pytest.fixture
+def bench(request: pytest.FixtureRequest, bench_session: BenchmarkSession) -> Callable[..., float]:
+    """
+    `bench(fn)` mede `fn()` e devolve microssegundos por chamada.
+    O nome do baseline é o nome do teste (com parâmetros).
+    """
+    if not (_env_flag("BENCH") or bench_session.save):
+        pytest.skip("benchmarks desligados (use BENCH=1)")
+
+    def run(fn: Callable[[], Any]) -> float:
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=REPEAT, number=number)) / number
+        micros = round(best * 1_000_000, 3)
+
+        name = request.node.name
+        bench_session.results[name] = micros
+        baseline = bench_session.baselines.get(name)
+        if not bench_session.save and baseline is not None:
+            limit = baseline * (1 + bench_session.threshold)
+            assert micros <= limit, (
+                f"{name}: {micros} µs/chamada, baseline {baseline} µs "
+                f"(limite {round(limit, 3)} µs com threshold {bench_session.threshold:.0%})"
+            )
+        return micros
+
+    return run
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    bench_session: BenchmarkSession | None = getattr(session.config, "_bench_session", None)
+    if bench_session is not None and bench_session.save and bench_session.results:
+        bench_session.write()
+
+
+def pytest_terminal_summary(terminalreporter: Any, exitstatus: int, config: pytest.Config) -> None:
+    bench_session: BenchmarkSession | None = getattr(config, "_bench_session", None)
+    if bench_session is None or not bench_session.results:
+        return
+    terminalreporter.section("benchmarks (µs/chamada)")
+    for name, micros in sorted(bench_session.results.items()):
+        baseline = bench_session.baselines.get(name)
+        delta = f"{(micros / baseline - 1):+.1%}" if baseline else "sem baseline"
+        terminalreporter.write_line(f"{name:<55} {micros:>12.3f}  {delta}")
+    if bench_session.save:
+        terminalreporter.write_line(f"baselines gravados em {BASELINES_PATH}")
@@ -0,0 +1,125 @@
+"""
+Micro-benchmarks das funções puras do caminho quente de /mensagem.
+Nenhum teste faz rede: o ProRAF é substituído por um cliente em memória.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+from typing import Any
+
+import pytest
+
+from api_test.agents import AgriculturalMultiAgentService
+from api_test.api_proraf import ProrafAPI, _hmac_sha256
+from api_test.phone import normalize_phone
+
+# Saídas típicas do planner: JSON puro, em bloco markdown e a resposta "0".
+PLANNER_OUTPUTS = {
+    "json": json.dumps(
+        {
+            "operation": "create_batch",
+            "api_method": "criar_lote",
+            "request_body": {
+                "telefone": "55996852212",
+                "name": "Tomate",
+                "talhao": "B",
+                "producao": 30,
+                "unidadeMedida": "kg",
+                "dt_colheita": "2025-03-10",
+            },
+            "missing_fields": [],
+            "reasoning": "O usuário informou colheita de tomate no talhão B.",
+        },
+        ensure_ascii=False,
+    ),
+    "markdown": (
+        "```json\n"
+        '{\n  "operation": "list_products",\n  "api_method": "listar_produtos",\n'
+        '  "request_body": {"telefone": "55996852212"},\n  "missing_fields": []\n}\n'
+        "```"
+    ),
+    "zero": "0",
+}
+
+PHONE_INPUTS = [
+    "55996852212",
+    "+55 (55) 99685-2212",
+    "5555996852212",
+    "555596852212@s.whatsapp.net",
+    "5555996852212:12@s.whatsapp.net",
+    "120363025246125888@g.us",
+]
+
+CATALOG_SIZE = 5000
+
+
+class StubProraf:
+    """Cliente em memória com um catálogo grande e a mesma interface usada na resolução de produto."""
+
+    def __init__(self, size: int) -> None:
+        self.catalog = {
+            "success": True,
+            "products": [{"id": index, "name": f"Produto {index:05d}"} for index in range(size)],
+        }
+
+    def listar_produtos(self, telefone: str) -> dict[str, Any]:
+        return self.catalog
+
+    def criar_produto(self, telefone: str, nome: str, descricao: Any = None, variedade: Any = None) -> dict[str, Any]:
+        return {"success": True, "product_id": CATALOG_SIZE + 1, "product_name": nome}
+
+
+@pytest.fixture(scope="module")
+def service() -> AgriculturalMultiAgentService:
+    return AgriculturalMultiAgentService(proraf=StubProraf(CATALOG_SIZE))
+
+
+def test_gerar_hash_repetido(bench):
+    proraf = ProrafAPI(base_url="http://localhost", secret_key="chave-de-teste")
+    bench(lambda: proraf.gerar_hash("55996852212"))
+
+
+def test_gerar_hash_telefones_distintos(bench):
+    proraf = ProrafAPI(base_url="http://localhost", secret_key="chave-de-teste")
+    # Mais telefones que o cache do HMAC: mede o cálculo real.
+    phones = itertools.cycle([f"55{index:09d}" for index in range(10000)])
+    _hmac_sha256.cache_clear()
+    bench(lambda: proraf.gerar_hash(next(phones)))
+
+
+@pytest.mark.parametrize("kind", sorted(PLANNER_OUTPUTS))
+def test_parse_agent_output(bench, kind):
+    content = PLANNER_OUTPUTS[kind]
+    bench(lambda: AgriculturalMultiAgentService._parse_agent_output(content))
+
+
+def test_planner_payload_dumps(bench):
+    planner_input = {
+        "mensagem_usuario": "colhi 30 kg de tomate no talhão B ontem, pode registrar?",
+        "telefone_contexto": "55996852212",
+        "historico": "usuário: listar meus produtos | assistente: listar_produtos -> 12 produtos",
+    }
+    bench(lambda: json.dumps(planner_input, ensure_ascii=False))
+
+
+def test_normalize_phone_cache(bench):
+    phones = itertools.cycle(PHONE_INPUTS)
+    bench(lambda: normalize_phone(next(phones)))
+
+
+def test_normalize_phone_sem_cache(bench):
+    phones = itertools.cycle(PHONE_INPUTS)
+    raw = normalize_phone.__wrapped__
+    bench(lambda: raw(next(phones)))
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["Produto 00000", f"Produto {CATALOG_SIZE - 1:05d}", "Produto novo"],
+    ids=["primeiro", "ultimo", "ausente"],
+)
+def test_resolve_product_id_by_name(bench, service, name):
+    request_body = {"name": name}
+    bench(lambda: service._resolve_product_id_by_name("55996852212", request_body))
@@ -0,0 +1,53 @@
+"""Lanes de admissão: limite de requisições em andamento por classe de rota."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from api_test.admission import AdmissionRejected, Lane
+
+
+def test_lane_recusa_acima_do_limite():
+    async def scenario() -> None:
+        lane = Lane("phone", max_inflight=1, retry_after=3)
+        release = threading.Event()
+        task = asyncio.create_task(lane.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await lane.run(lambda: None)
+        assert excinfo.value.retry_after == 3
+        release.set()
+        assert await task is True
+        assert lane.stats()["rejected"] == 1
+        lane.executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancelamento_so_libera_a_vaga_quando_a_thread_termina():
+    async def scenario() -> None:
+        lane = Lane("chatbot", max_inflight=1, retry_after=5)
+        release = threading.Event()
+
+        task = asyncio.create_task(lane.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # A thread ainda está rodando: a vaga continua ocupada.
+        assert lane.inflight == 1
+        with pytest.raises(AdmissionRejected):
+            await lane.run(lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if not lane.inflight:
+                break
+            await asyncio.sleep(0.01)
+        assert lane.inflight == 0
+        lane.executor.shutdown()
+
+    asyncio.run(scenario())
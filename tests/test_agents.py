@@ -0,0 +1,13 @@
+"""Serviço multiagente: cache das respostas renderizadas."""
+
+from __future__ import annotations
+
+from api_test.agents import _reply_cache_key
+
+
+def test_resposta_em_cache_e_por_telefone_e_por_pergunta():
+    result = {"exists": False}
+    base = _reply_cache_key("verificar_telefone", "estou cadastrado", "verify_phone", {"telefone": "1"}, result)
+    assert base == _reply_cache_key("verificar_telefone", "Estou cadastrado!", "verify_phone", {"telefone": "1"}, result)
+    assert base != _reply_cache_key("verificar_telefone", "estou cadastrado", "verify_phone", {"telefone": "2"}, result)
+    assert base != _reply_cache_key("verificar_telefone", "meu cadastro existe?", "verify_phone", {"telefone": "1"}, result)
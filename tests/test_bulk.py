@@ -0,0 +1,44 @@
+"""Importação em massa de colheitas."""
+
+from __future__ import annotations
+
+from api_test.bulk import HarvestImporter, normalize_row
+
+
+class _Proraf:
+    def __init__(self, listings: list[dict]) -> None:
+        self.listings = listings
+        self.created: list[str] = []
+        self.batches: list[int] = []
+
+    def listar_produtos(self, telefone):
+        return self.listings.pop(0)
+
+    def criar_produto(self, telefone, nome, descricao=None, variedade=None):
+        self.created.append(nome)
+        return {"success": True, "product_id": 99}
+
+    def criar_lote(self, telefone, product_id, **fields):
+        self.batches.append(product_id)
+        return {"success": True, "batch_id": len(self.batches)}
+
+
+def test_normalize_row_aceita_apelidos_de_coluna():
+    row = normalize_row({"Telefone": "(53) 99999-0001", "Produto": " Tomate ", "Quantidade": "30", "Unidade": "kg"})
+    assert row["name"] == "Tomate"
+    assert row["unidadeMedida"] == "kg"
+
+
+def test_catalogo_com_erro_falha_a_linha_sem_criar_produto():
+    outage = {"error": "Bad Gateway", "success": False, "products": [], "status_code": 502}
+    catalog = {"success": True, "products": [{"id": 7, "name": "Tomate"}]}
+    proraf = _Proraf([outage, catalog])
+    importer = HarvestImporter(proraf, max_concurrency=1)
+    row = {"telefone": "1", "name": "Tomate", "producao": "30", "unidadeMedida": "kg"}
+
+    assert importer.import_row(row) == outage
+    assert proraf.created == []
+    # A falha não fica guardada: a próxima linha recarrega o catálogo.
+    assert importer.import_row(row)["success"] is True
+    assert proraf.batches == [7]
+    assert proraf.created == []
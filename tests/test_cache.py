@@ -0,0 +1,75 @@
+"""Backends de cache: LRU em memória e SQLite compartilhado."""
+
+from __future__ import annotations
+
+import pytest
+
+from api_test.cache import MemoryLRUCache, NullCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryLRUCache(max_entries=100, default_ttl=60)
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=100, default_ttl=60)
+
+
+def test_set_get_e_contadores(cache):
+    assert cache.get("a") is None
+    cache.set("a", {"products": [1, 2]})
+    assert cache.get("a") == {"products": [1, 2]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_entrada_expirada_nao_e_devolvida(cache):
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+
+
+def test_delete_e_delete_prefix(cache):
+    cache.set("listar_produtos:1", 1)
+    cache.set("listar_produtos:2", 2)
+    cache.set("planner:x", 3)
+    cache.delete("listar_produtos:1")
+    assert cache.get("listar_produtos:1") is None
+    cache.delete_prefix("listar_produtos:")
+    assert cache.get("listar_produtos:2") is None
+    assert cache.get("planner:x") == 3
+
+
+def test_delete_prefix_nao_trata_curinga_do_like():
+    cache = SQLiteCache(":memory:", max_entries=10)
+    cache.set("a_b", 1)
+    cache.set("axb", 2)
+    cache.delete_prefix("a_")
+    assert cache.get("a_b") is None
+    assert cache.get("axb") == 2
+
+
+def test_lru_descarta_o_menos_usado():
+    cache = MemoryLRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_sqlite_e_compartilhado_entre_instancias(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    worker_a = SQLiteCache(path)
+    worker_b = SQLiteCache(path)
+    worker_a.set("verificar_telefone:1", {"exists": True})
+    assert worker_b.get("verificar_telefone:1") == {"exists": True}
+    worker_b.delete("verificar_telefone:1")
+    assert worker_a.get("verificar_telefone:1") is None
+
+
+def test_null_cache_nunca_guarda():
+    cache = NullCache()
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["backend"] == "none"
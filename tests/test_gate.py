@@ -0,0 +1,63 @@
+"""Filtro local de conversa que roda antes do planner."""
+
+from __future__ import annotations
+
+import pytest
+
+from api_test.gate import GATE_REPLIES, MessageGate, classify_small_talk
+
+
+@pytest.mark.parametrize(
+    "message, category",
+    [
+        ("Oi", "greeting"),
+        ("Bom dia! Tudo bem?", "greeting"),
+        ("olá", "greeting"),
+        ("Muito obrigado pela ajuda", "thanks"),
+        ("vlw", "thanks"),
+        ("Tchau, até mais", "goodbye"),
+        ("ok", "ack"),
+        ("Beleza, entendi", "ack"),
+        ("👍", "empty"),
+        ("...", "empty"),
+    ],
+)
+def test_conversa_e_reconhecida(message, category):
+    assert classify_small_talk(message) == category
+    assert category in GATE_REPLIES
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "oi, listar meus produtos",
+        "obrigado, agora cadastra um lote de 30 kg de tomate",
+        "ok pode registrar 20 caixas de alface",
+        "bom dia " * 10,
+    ],
+)
+def test_mensagem_com_pedido_segue_para_o_planner(message):
+    assert classify_small_talk(message) is None
+
+
+def test_gate_conta_decisoes():
+    gate = MessageGate()
+    assert gate.check("oi") == "greeting"
+    assert gate.check("listar meus produtos") is None
+    stats = gate.stats()
+    assert stats["greeting"] == 1
+    assert stats["passed"] == 1
+
+
+def test_gate_desligado_nao_filtra():
+    gate = MessageGate(enabled=False)
+    assert gate.check("oi") is None
+    assert gate.stats() == {"enabled": False, "passed": 0}
+
+
+def test_confirmacao_no_meio_da_conversa_segue_para_o_planner():
+    gate = MessageGate()
+    assert gate.check("sim", in_conversation=True) is None
+    assert gate.check("ok", in_conversation=False) == "ack"
+    # Saudações continuam sendo respondidas localmente.
+    assert gate.check("oi", in_conversation=True) == "greeting"
@@ -0,0 +1,57 @@
+"""Circuit breaker, percentis de latência e snapshot de readiness."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+from api_test.health import HealthMonitor, Upstream
+
+
+def test_circuito_abre_apos_falhas_seguidas_e_fecha_no_teste():
+    upstream = Upstream("proraf", window=10, failure_threshold=2, reset_seconds=0.05)
+    upstream.record(5, ok=False)
+    assert upstream.allow()
+    upstream.record(5, ok=False)
+    assert upstream.state() == "open"
+    assert not upstream.allow()
+
+    time.sleep(0.06)
+    assert upstream.state() == "half_open"
+    # Só uma chamada de teste por período.
+    assert upstream.allow()
+    assert not upstream.allow()
+    upstream.record(5, ok=True)
+    assert upstream.state() == "closed"
+    assert upstream.allow()
+    assert upstream.snapshot()["opened"] == 1
+
+
+def test_percentis_das_latencias_recentes():
+    upstream = Upstream("openai", window=100, failure_threshold=5, reset_seconds=1)
+    for elapsed_ms in range(1, 101):
+        upstream.record(elapsed_ms, ok=True)
+    latency = upstream.snapshot()["latency_ms"]
+    assert (latency["samples"], latency["p50"], latency["p99"], latency["max"]) == (100, 51, 100, 100)
+
+
+def test_readiness_vem_do_snapshot():
+    upstream = Upstream("proraf", window=10, failure_threshold=5, reset_seconds=1)
+    results = {"proraf": True}
+    monitor = HealthMonitor(
+        upstreams={"proraf": upstream},
+        probes={"proraf": lambda: results["proraf"]},
+        interval_seconds=10,
+        stale_after_seconds=30,
+    )
+    assert monitor.ready()[0] == 503
+
+    asyncio.run(monitor.run_once())
+    status_code, body = monitor.ready()
+    assert status_code == 200
+    assert json.loads(body)["checks"]["proraf"]["ok"] is True
+
+    results["proraf"] = False
+    asyncio.run(monitor.run_once())
+    assert monitor.ready()[0] == 503
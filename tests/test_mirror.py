@@ -0,0 +1,89 @@
+"""Espelho local de catálogos e sua sincronização."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from api_test.mirror import CatalogMirror, MirrorSync
+
+
+def test_lookup_por_nome_normalizado():
+    mirror = CatalogMirror()
+    mirror.replace("(53) 99999-0001", [{"id": 7, "name": "Tomate Cereja"}, {"id": 8, "name": "Alface"}])
+    assert mirror.lookup("53999990001", "  tomate cereja ") == 7
+    assert mirror.lookup("53999990001", "Rúcula") is None
+    assert mirror.lookup("53999990002", "Alface") is None
+    stats = mirror.stats()
+    assert (stats["hits"], stats["misses"], stats["products"]) == (1, 2, 2)
+
+
+def test_add_so_para_telefone_espelhado_e_limpa_validadores():
+    mirror = CatalogMirror()
+    mirror.add("1", 5, "Tomate")
+    assert not mirror.contains("1")
+
+    mirror.replace("1", [{"id": 7, "name": "Alface"}], etag='"v1"')
+    mirror.add("1", 5, "Tomate")
+    assert mirror.lookup("1", "tomate") == 5
+    assert mirror.validators("1") == (None, None)
+
+
+def test_replace_e_retain():
+    mirror = CatalogMirror()
+    mirror.replace("1", [{"id": 1, "name": "A"}])
+    mirror.replace("2", [{"id": 2, "name": "B"}])
+    mirror.replace("1", [{"id": 3, "name": "C"}])
+    assert mirror.lookup("1", "A") is None
+    assert mirror.lookup("1", "C") == 3
+
+    mirror.retain({"2"})
+    assert not mirror.contains("1")
+    assert mirror.contains("2")
+
+
+class _Proraf:
+    def __init__(self, phones) -> None:
+        self.phones = phones
+        self.listed: list[str] = []
+
+    def listar_telefones(self):
+        return self.phones
+
+    def listar_produtos_sem_cache(self, telefone, etag=None, last_modified=None):
+        self.listed.append(telefone)
+        return {"success": True, "products": [{"id": 9, "name": "Milho"}], "etag": '"v2"'}
+
+
+def _sync(proraf, mirror) -> MirrorSync:
+    return MirrorSync(proraf, mirror, interval_seconds=60, batch_size=10, max_concurrency=2)
+
+
+def test_sync_revalida_telefones_cadastrados():
+    mirror = CatalogMirror()
+    mirror.replace("3", [{"id": 1, "name": "A"}])
+    proraf = _Proraf([{"telefone": "1"}, {"telefone": "2"}])
+
+    assert asyncio.run(_sync(proraf, mirror).run_once()) == 2
+    assert sorted(proraf.listed) == ["1", "2"]
+    assert mirror.lookup("1", "milho") == 9
+    assert mirror.validators("2") == ('"v2"', None)
+    assert not mirror.contains("3")
+
+
+@pytest.mark.parametrize(
+    "response",
+    [None, {"error": "Bad Gateway", "telefones": []}, {"detail": "não autorizado"}, "texto"],
+)
+def test_lista_de_telefones_invalida_nao_apaga_o_espelho(response):
+    mirror = CatalogMirror()
+    mirror.replace("1", [{"id": 1, "name": "A"}])
+    proraf = _Proraf(response)
+    sync = _sync(proraf, mirror)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(sync.run_once())
+    assert mirror.lookup("1", "A") == 1
+    assert proraf.listed == []
+    assert sync.stats["errors"] == 1
@@ -0,0 +1,151 @@
+"""Fila local de escritas (outbox) e seu flusher."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from api_test.agents import AgriculturalMultiAgentService
+from api_test.outbox import DONE, FAILED, PENDING, REJECTED, SENDING, Outbox, OutboxFlusher, is_transient
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(str(tmp_path / "outbox.sqlite3"), max_attempts=3, base_backoff_seconds=0)
+
+
+@pytest.mark.parametrize(
+    "result, transient",
+    [
+        ({"success": True}, False),
+        ({"error": "Produto não encontrado", "status_code": 404}, False),
+        ({"error": "Internal Server Error", "status_code": 502}, True),
+        ({"error": "Timeout na requisição"}, True),
+        ({"error": "Erro de conexão: recusada"}, True),
+        ({"error": "Circuito aberto para o ProRAF: muitas falhas seguidas"}, True),
+        ({"error": "Telefone inválido"}, False),
+        (None, False),
+    ],
+)
+def test_is_transient(result, transient):
+    assert is_transient(result) is transient
+
+
+def test_claim_reserva_so_a_mais_antiga_de_cada_telefone(outbox):
+    first = outbox.enqueue("1", "criar_lote", {"n": 1})
+    second = outbox.enqueue("1", "criar_lote", {"n": 2})
+    other = outbox.enqueue("2", "criar_produto", {"n": 3})
+
+    claimed = outbox.claim_heads(10)
+    assert [entry["id"] for entry in claimed] == [first, other]
+    assert claimed[0]["request_body"] == {"n": 1}
+    assert outbox.get(first)["status"] == SENDING
+    # Enquanto a primeira do telefone não termina, a segunda espera.
+    assert outbox.claim_heads(10) == []
+
+    outbox.complete(first, {"success": True, "batch_id": 10})
+    assert [entry["id"] for entry in outbox.claim_heads(10)] == [second]
+    assert outbox.get(first)["status"] == DONE
+    assert outbox.get(first)["result"] == {"success": True, "batch_id": 10}
+
+
+def test_recusa_fica_como_rejected(outbox):
+    entry_id = outbox.enqueue("1", "criar_lote", {})
+    outbox.claim_heads(1)
+    outbox.complete(entry_id, {"success": False, "error": "Produto inválido", "status_code": 400})
+    assert outbox.get(entry_id)["status"] == REJECTED
+
+
+def test_nova_tentativa_com_backoff_ate_esgotar(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), max_attempts=2, base_backoff_seconds=60)
+    entry_id = outbox.enqueue("1", "criar_lote", {})
+    outbox.claim_heads(1)
+
+    outbox.retry_later(entry_id, 0, "Timeout")
+    entry = outbox.get(entry_id)
+    assert entry["status"] == PENDING
+    assert entry["attempts"] == 1
+    assert entry["next_attempt_at"] > time.time() + 50
+    # Ainda em backoff: não é reservada.
+    assert outbox.claim_heads(1) == []
+
+    outbox.retry_later(entry_id, 1, "Timeout")
+    assert outbox.get(entry_id)["status"] == FAILED
+
+
+def test_reclaim_devolve_reservas_abandonadas(outbox):
+    entry_id = outbox.enqueue("1", "criar_lote", {})
+    outbox.claim_heads(1)
+    outbox.reclaim_stale(timeout_seconds=-1)
+    assert outbox.get(entry_id)["status"] == PENDING
+
+
+def test_list_filtra_por_telefone_e_status(outbox):
+    outbox.enqueue("1", "criar_lote", {})
+    outbox.enqueue("2", "criar_lote", {})
+    assert [entry["telefone"] for entry in outbox.list(telefone="2")] == ["2"]
+    assert len(outbox.list(status=PENDING)) == 2
+    assert outbox.stats() == {PENDING: 2}
+
+
+def test_flusher_entrega_e_repete_falhas_temporarias(outbox):
+    calls = []
+
+    def send(api_method, request_body):
+        calls.append(request_body["n"])
+        if len(calls) == 1:
+            return {"success": False, "error": "Internal Server Error", "status_code": 503}
+        return {"success": True}
+
+    entry_id = outbox.enqueue("1", "criar_lote", {"n": 1})
+    flusher = OutboxFlusher(outbox, send, max_concurrency=2, poll_interval_seconds=0, claim_timeout_seconds=60)
+
+    asyncio.run(flusher.flush_once())
+    assert outbox.get(entry_id)["status"] == PENDING
+    asyncio.run(flusher.flush_once())
+    assert outbox.get(entry_id)["status"] == DONE
+    assert calls == [1, 1]
+
+
+def test_flusher_trata_excecao_como_recusa(outbox):
+    def send(api_method, request_body):
+        raise ValueError("body inválido")
+
+    entry_id = outbox.enqueue("1", "criar_lote", {})
+    flusher = OutboxFlusher(outbox, send, max_concurrency=1, poll_interval_seconds=0, claim_timeout_seconds=60)
+    asyncio.run(flusher.flush_once())
+    entry = outbox.get(entry_id)
+    assert entry["status"] == REJECTED
+    assert "body inválido" in entry["result"]["error"]
+
+
+class _ProrafFora:
+    """ProRAF com 5xx na listagem: o produto do lote não pode ser resolvido."""
+
+    def __init__(self) -> None:
+        self.created: list[str] = []
+
+    def listar_produtos(self, telefone):
+        return {"error": "Bad Gateway", "success": False, "products": [], "status_code": 502}
+
+    def criar_produto(self, telefone, nome, descricao=None, variedade=None):
+        self.created.append(nome)
+        return {"error": "Bad Gateway", "success": False, "status_code": 502}
+
+
+def test_lote_com_produto_por_nome_espera_o_proraf_voltar(outbox):
+    proraf = _ProrafFora()
+    service = AgriculturalMultiAgentService(proraf=proraf, outbox=outbox)
+    body = {"telefone": "1", "name": "Tomate", "producao": 30, "unidadeMedida": "kg"}
+    entry_id = outbox.enqueue("1", "criar_lote", body)
+
+    flusher = OutboxFlusher(outbox, service.send_queued, max_concurrency=1, poll_interval_seconds=0, claim_timeout_seconds=60)
+    asyncio.run(flusher.flush_once())
+
+    entry = outbox.get(entry_id)
+    assert entry["status"] == PENDING
+    assert entry["attempts"] == 1
+    # Sem catálogo, nenhum produto é criado às cegas.
+    assert proraf.created == []
@@ -0,0 +1,63 @@
+"""Normalização de telefones e leitura da resposta de `listar_telefones`."""
+
+from __future__ import annotations
+
+import pytest
+
+from api_test.phone import extract_phones, normalize_phone
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "55996852212",
+        "+55 (55) 99685-2212",
+        "5555996852212",
+        "555596852212@s.whatsapp.net",
+        "5555996852212:12@s.whatsapp.net",
+        "  55 99685 2212  ",
+    ],
+)
+def test_formatos_aceitos_viram_forma_canonica(raw):
+    assert normalize_phone(raw) == "55996852212"
+
+
+def test_celular_sem_nono_digito_ganha_o_nove():
+    assert normalize_phone("5596852212") == "55996852212"
+
+
+def test_fixo_nao_ganha_nono_digito():
+    assert normalize_phone("5532221234") == "5532221234"
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("120363025246125888@g.us", "120363025246125888@g.us"),
+        ("98765432100@LID", "98765432100@lid"),
+    ],
+)
+def test_jid_sem_telefone_vira_chave_estavel(raw, expected):
+    assert normalize_phone(raw) == expected
+
+
+@pytest.mark.parametrize("raw", [None, "", "   "])
+def test_vazio(raw):
+    assert normalize_phone(raw) == ""
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        ["5555996852212", "53999990001"],
+        {"telefones": [{"telefone": "+55 55 99685-2212"}, {"telefone": "53999990001"}]},
+        {"phones": ["55996852212", "53999990001"]},
+    ],
+)
+def test_extract_phones_aceita_lista_crua_ou_objetos(response):
+    assert extract_phones(response) == ["55996852212", "53999990001"]
+
+
+@pytest.mark.parametrize("response", [None, {"error": "Timeout", "telefones": []}, "texto", [{"nome": "sem telefone"}]])
+def test_extract_phones_ignora_respostas_sem_telefone(response):
+    assert extract_phones(response) == []
@@ -0,0 +1,102 @@
+"""Planner em duas etapas: intenção local, prompt estreito e prompt completo."""
+
+from __future__ import annotations
+
+import pytest
+
+from api_test.agents import AgriculturalMultiAgentService
+from api_test.planning import NARROW_PROMPTS, PlannerRouting, accepts, classify_intent, local_plan
+from api_test.prompts import CRUD_PLANNER_PROMPT
+
+
+@pytest.mark.parametrize(
+    "message, intent",
+    [
+        ("listar meus produtos", "list_products"),
+        ("Quais são os meus produtos?", "list_products"),
+        ("verificar meu telefone", "verify_phone"),
+        ("estou cadastrado", "verify_phone"),
+        ("listar telefones", "list_phones"),
+        ("colhi 30 kg de tomate no talhão B", "create_batch"),
+        ("cadastra 200 abacaxis", "create_batch"),
+        ("cadastrar laranja pera", "create_product"),
+        ("atualizar a descrição do produto 5", "update_product"),
+        ("qual a previsão do tempo?", None),
+        ("", None),
+    ],
+)
+def test_classify_intent(message, intent):
+    assert classify_intent(message) == intent
+
+
+def test_local_plan():
+    assert local_plan("list_products", "55996852212")["request_body"] == {"telefone": "55996852212"}
+    assert local_plan("list_phones", "55996852212")["request_body"] == {}
+    assert local_plan("verify_phone", None)["api_method"] == "verificar_telefone"
+
+
+def test_accepts():
+    assert accepts("create_batch", {"operation": "create_batch"})
+    assert accepts("create_batch", {"operation": "none"})
+    assert not accepts("create_batch", {"operation": "outro"})
+    assert not accepts("create_batch", 0)
+
+
+class _OfflineProraf:
+    """O planner não toca no ProRAF."""
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = AgriculturalMultiAgentService(proraf=_OfflineProraf())
+    calls: list[tuple[str, str]] = []
+    answers: dict[str, dict] = {}
+
+    def invoke_json(system_prompt, user_message, stage="planner", telefone=None):
+        calls.append((system_prompt, stage))
+        return answers.get(stage, {"operation": "none"})
+
+    monkeypatch.setattr(service, "_invoke_json", invoke_json)
+    service.calls = calls
+    service.answers = answers
+    return service
+
+
+def test_consulta_simples_nao_chama_o_modelo(service):
+    plan = service.plan("listar meus produtos", "55996852212", use_cache=False)
+    assert plan["api_method"] == "listar_produtos"
+    assert service.calls == []
+    assert service.planner_routing.stats()["local"] == 1
+
+
+def test_escrita_usa_prompt_estreito(service):
+    service.answers["planner_create_batch"] = {"operation": "create_batch", "api_method": "criar_lote"}
+    plan = service.plan("colhi 30 kg de tomate", "55996852212", use_cache=False)
+    assert plan["operation"] == "create_batch"
+    assert service.calls == [(NARROW_PROMPTS["create_batch"], "planner_create_batch")]
+    assert service.planner_routing.stats()["narrow"] == 1
+
+
+def test_recusa_do_prompt_estreito_cai_no_completo(service):
+    service.answers["planner_create_batch"] = {"operation": "outro"}
+    service.answers["planner"] = {"operation": "create_product", "api_method": "criar_produto"}
+    plan = service.plan("colhi 30 kg de tomate", "55996852212", use_cache=False)
+    assert plan["operation"] == "create_product"
+    assert [stage for _, stage in service.calls] == ["planner_create_batch", "planner"]
+    assert service.calls[-1][0] == CRUD_PLANNER_PROMPT
+    counts = service.planner_routing.stats()
+    assert (counts["fallback"], counts["full"]) == (1, 1)
+
+
+def test_sem_intencao_usa_o_prompt_completo(service):
+    service.plan("qual a previsão do tempo?", "55996852212", use_cache=False)
+    assert service.calls == [(CRUD_PLANNER_PROMPT, "planner")]
+
+
+def test_routing_estima_tokens_economizados():
+    routing = PlannerRouting()
+    routing.record_local("list_products", "{}")
+    routing.record_narrow("create_batch", accepted=False)
+    stats = routing.stats()
+    assert stats["estimated_prompt_tokens_saved"]["planner_list_products"] > 0
+    assert stats["estimated_prompt_tokens_saved"]["planner_create_batch"] < 0
@@ -0,0 +1,73 @@
+"""Pré-busca especulativa e o cache do catálogo."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from api_test.api_proraf import ProrafAPI
+from api_test.cache import MemoryLRUCache
+from api_test.prefetch import PrefetchStats, SpeculativePrefetch
+
+
+class _Response:
+    status_code = 200
+    headers: dict[str, str] = {}
+
+    def __init__(self, data) -> None:
+        self.data = data
+        self.text = str(data)
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def _api() -> ProrafAPI:
+    return ProrafAPI(base_url="http://proraf.invalid", secret_key="k", cache=MemoryLRUCache(max_entries=10))
+
+
+def test_leitura_iniciada_antes_da_invalidacao_nao_grava_no_cache(monkeypatch):
+    api = _api()
+    old_catalog = {"success": True, "products": [{"id": 1, "name": "Alface"}]}
+
+    def request(method, endpoint, **kwargs):
+        # Um criar_produto termina enquanto a leitura ainda está em andamento.
+        api.invalidar_produtos("53999990001")
+        return _Response(old_catalog)
+
+    monkeypatch.setattr(api, "_request", request)
+    assert api.listar_produtos("53999990001") == old_catalog
+    assert api.cache.get("listar_produtos:53999990001") is None
+
+
+def test_leitura_sem_escrita_concorrente_vai_para_o_cache(monkeypatch):
+    api = _api()
+    catalog = {"success": True, "products": []}
+    monkeypatch.setattr(api, "_request", lambda method, endpoint, **kwargs: _Response(catalog))
+    api.listar_produtos("53999990001")
+    assert api.cache.get("listar_produtos:53999990001") == catalog
+
+
+def test_prefetch_usa_o_resultado_so_uma_vez():
+    class Proraf:
+        calls = 0
+
+        def listar_produtos(self, telefone):
+            Proraf.calls += 1
+            return {"products": [], "telefone": telefone}
+
+        def verificar_telefone(self, telefone):
+            return {"exists": True}
+
+    stats = PrefetchStats()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        prefetch = SpeculativePrefetch(Proraf(), executor, stats, "1")
+        assert prefetch.listar_produtos("1") == {"products": [], "telefone": "1"}
+        prefetch.listar_produtos("1")
+        prefetch.close()
+    assert Proraf.calls == 2
+    snapshot = stats.snapshot()
+    assert snapshot["listar_produtos"]["used"] == 1
+    assert snapshot["verificar_telefone"]["wasted"] == 1
@@ -0,0 +1,101 @@
+"""Escalonamento justo por telefone e lanes de admissão."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from api_test.admission import AdmissionRejected, Lane
+from api_test.scheduler import FairScheduler
+
+
+def _scheduler(**overrides) -> FairScheduler:
+    options = {"max_inflight": 1, "phone_max_inflight": 1, "phone_max_queued": 10, "max_queued": 100, "retry_after": 5}
+    options.update(overrides)
+    return FairScheduler(**options)
+
+
+def test_rodizio_entre_telefones():
+    async def scenario() -> list[str]:
+        scheduler = _scheduler()
+        order: list[str] = []
+        gate = asyncio.Event()
+
+        async def job(label: str) -> None:
+            order.append(label)
+            await gate.wait()
+
+        # "a" chega primeiro com três mensagens; "b" com uma logo depois.
+        tasks = [asyncio.create_task(scheduler.run("a", job, f"a{index}")) for index in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(scheduler.run("b", job, "b0")))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_fila_do_telefone_cheia_e_recusada():
+    async def scenario() -> None:
+        scheduler = _scheduler(phone_max_queued=2)
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(scheduler.run("a", gate.wait)) for _ in range(3)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await scheduler.run("a", gate.wait)
+        # Outro telefone continua sendo aceito.
+        tasks.append(asyncio.create_task(scheduler.run("b", gate.wait)))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["rejected"] == 1
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.stats()["phones_active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_mensagens_sem_telefone_usam_a_lane_inteira():
+    async def scenario() -> int:
+        scheduler = _scheduler(max_inflight=8, phone_max_inflight=2, phone_max_queued=2)
+        peak = 0
+
+        async def job() -> None:
+            nonlocal peak
+            peak = max(peak, scheduler.inflight)
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(scheduler.run(None, job) for _ in range(40)))
+        return peak
+
+    assert asyncio.run(scenario()) == 8
+
+
+def test_cancelamento_so_libera_a_vaga_quando_o_trabalho_termina():
+    async def scenario() -> None:
+        lane = Lane("chatbot", max_inflight=1, retry_after=5)
+        scheduler = _scheduler()
+        release = threading.Event()
+
+        task = asyncio.create_task(scheduler.run("a", lane.run, release.wait, 5))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # A thread ainda está rodando: as vagas continuam ocupadas.
+        assert (scheduler.inflight, lane.inflight) == (1, 1)
+        with pytest.raises(AdmissionRejected):
+            await lane.run(lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if not (scheduler.inflight or lane.inflight):
+                break
+            await asyncio.sleep(0.01)
+        assert (scheduler.inflight, lane.inflight) == (0, 0)
+        lane.executor.shutdown()
+
+    asyncio.run(scenario())
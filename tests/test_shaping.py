@@ -0,0 +1,59 @@
+"""Redução do resultado da API antes de enviá-lo aos prompts."""
+
+from __future__ import annotations
+
+import json
+
+from api_test.shaping import shape_api_result
+from api_test.usage import estimate_tokens
+
+
+def test_projeta_so_os_campos_usados_pelo_metodo():
+    result = {
+        "success": True,
+        "exists": True,
+        "nome": "Maria",
+        "hash": "segredo",
+        "created_at": "2025-01-01",
+    }
+    assert shape_api_result("verificar_telefone", result, max_tokens=1000) == {
+        "success": True,
+        "exists": True,
+        "nome": "Maria",
+    }
+
+
+def test_mantem_campos_de_status_e_da_outbox():
+    result = {"success": True, "queued": True, "outbox_id": 7, "status": "pending", "extra": [1, 2]}
+    assert shape_api_result("criar_lote", result, max_tokens=1000) == {
+        "success": True,
+        "queued": True,
+        "outbox_id": 7,
+        "status": "pending",
+    }
+
+
+def test_lista_cortada_informa_total_e_omitidos():
+    products = [{"id": index, "name": f"Produto {index}", "description": "x" * 50} for index in range(30)]
+    shaped = shape_api_result("listar_produtos", {"success": True, "products": products}, max_tokens=10_000, max_items=10)
+    assert shaped["total"] == 30
+    assert shaped["itens_omitidos"] == 20
+    assert shaped["products"][0] == {"id": 0, "name": "Produto 0"}
+    assert len(shaped["products"]) == 10
+
+
+def test_lista_respeita_teto_de_tokens():
+    products = [{"id": index, "name": f"Produto com nome comprido {index}"} for index in range(200)]
+    shaped = shape_api_result("listar_produtos", {"products": products}, max_tokens=200, max_items=200)
+    assert estimate_tokens(json.dumps(shaped, ensure_ascii=False)) <= 200
+    assert shaped["total"] == 200
+    assert shaped["itens_omitidos"] == 200 - len(shaped["products"])
+
+
+def test_metodo_desconhecido_mantem_so_valores_simples():
+    result = {"ok": True, "count": 3, "nested": {"a": 1}, "items": [1]}
+    assert shape_api_result("outro", result, max_tokens=1000) == {"ok": True, "count": 3}
+
+
+def test_resultado_que_nao_e_dict_passa_direto():
+    assert shape_api_result("listar_telefones", ["55996852212"], max_tokens=10) == ["55996852212"]
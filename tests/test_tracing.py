@@ -0,0 +1,51 @@
+"""Traces de requisição, inclusive respostas em streaming."""
+
+from __future__ import annotations
+
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from api_test.main import trace_requests
+from api_test.tracing import Tracer, span
+
+
+def _tracer(tmp_path) -> Tracer:
+    return Tracer(path=str(tmp_path / "traces.jsonl"), enabled=True, sample_rate=1.0, slow_threshold_ms=0, max_bytes=1_000_000)
+
+
+def _read(path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_spans_filhos_entram_no_trace(tmp_path):
+    tracer = _tracer(tmp_path)
+    with tracer.trace("raiz"):
+        with span("filho"):
+            pass
+    (trace,) = _read(tmp_path / "traces.jsonl")
+    assert [item["name"] for item in trace["spans"]] == ["raiz", "filho"]
+
+
+def test_trace_de_streaming_fecha_depois_do_corpo(tmp_path):
+    app = FastAPI()
+    app.state.tracer = _tracer(tmp_path)
+    app.middleware("http")(trace_requests)
+
+    @app.get("/stream")
+    async def stream(request: Request):
+        async def body():
+            for index in range(3):
+                with span("linha", index=index):
+                    yield f"{index}\n"
+
+        return StreamingResponse(body(), media_type="text/plain")
+
+    with TestClient(app) as client:
+        assert client.get("/stream").text == "0\n1\n2\n"
+
+    (trace,) = _read(tmp_path / "traces.jsonl")
+    assert trace["name"] == "GET /stream"
+    assert [item["name"] for item in trace["spans"]].count("linha") == 3